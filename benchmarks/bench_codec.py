@@ -0,0 +1,76 @@
+'''
+Compare JSON backends and incremental decoding on a 1,000 item page
+
+Usage:
+    python benchmarks/bench_codec.py
+'''
+
+import json
+import tracemalloc
+from time import perf_counter
+
+from sparkpy import codec
+from sparkpy.codec import iter_items
+
+CHUNK = 65536
+ITEMS = [{'id': f'Y2lzY29zcGFyazovL3VzL01FU1NBR0UvMDAwMDAw{i:08d}',
+          'roomId': 'Y2lzY29zcGFyazovL3VzL1JPT00vMDAwMDAwMDA',
+          'roomType': 'group',
+          'text': 'A message which is about as long as a typical one ' * 2,
+          'personId': 'Y2lzY29zcGFyazovL3VzL1BFT1BMRS8wMDAwMDAwMA',
+          'personEmail': 'someone@example.com',
+          'created': '2017-08-26T12:01:36.373Z'} for i in range(1000)]
+PAGE = json.dumps({'items': ITEMS}).encode('utf-8')
+
+
+def chunks():
+    for i in range(0, len(PAGE), CHUNK):
+        yield PAGE[i:i + CHUNK]
+
+
+def timed(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        started = perf_counter()
+        fn()
+        best = min(best, perf_counter() - started)
+    return best * 1000
+
+
+def peak(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    print(f'{len(PAGE) / 1024:.0f} KiB page of {len(ITEMS)} items')
+    for name in codec.BACKENDS:
+        try:
+            codec.use(name)
+        except ImportError:
+            print(f'{name:<8} not installed')
+            continue
+        print(f'{name:<8} loads {timed(lambda: codec.loads(PAGE)):6.2f} ms  '
+              f'dumps {timed(lambda: codec.dumps(ITEMS)):6.2f} ms')
+
+    def whole():
+        for item in json.loads(b''.join(chunks()))['items']:
+            pass
+
+    def incremental():
+        for item in iter_items(chunks()):
+            pass
+
+    print(f'first item: whole page '
+          f'{timed(lambda: json.loads(b"".join(chunks()))["items"][0]):.2f}'
+          f' ms, incremental '
+          f'{timed(lambda: next(iter_items(chunks()))):.2f} ms')
+    print(f'peak memory: whole page {peak(whole):.0f} KiB, '
+          f'incremental {peak(incremental):.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+'''
+Measure sparkpy's import and start up cost in a fresh interpreter
+
+Each scenario is run `--runs` times and the best wall time reported, along
+with the slowest imports from `python -X importtime`.
+
+Usage:
+    python benchmarks/bench_import.py --runs 10
+'''
+
+import os
+import sys
+import argparse
+import subprocess
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = (('python', 'pass'),
+             ('import', 'import sparkpy'),
+             ('client', 'import sparkpy; sparkpy.Spark("TOKEN")'),
+             ('session', 'import sparkpy; sparkpy.Spark("TOKEN").session'))
+
+
+def run(code, importtime=False):
+    args = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+    started = perf_counter()
+    result = subprocess.run(args + ['-c', code],
+                            env=dict(os.environ, PYTHONPATH=ROOT),
+                            capture_output=True, text=True, check=True)
+    return perf_counter() - started, result.stderr
+
+
+def slowest(stderr, count):
+    imports = []
+    for line in stderr.splitlines()[1:]:
+        if line.startswith('import time:'):
+            own, cumulative, name = line.split(':', 1)[1].split('|')
+            imports.append((int(own), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+    for name, code in SCENARIOS:
+        best = min(run(code)[0] for _ in range(args.runs))
+        print(f'{name:<8} {best * 1000:7.1f} ms')
+        for own, module in slowest(run(code, importtime=True)[1], args.top):
+            print(f'    {own / 1000:6.1f} ms  {module}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+'''
+Measure building 100,000 models from API data, as a container does for
+each page it loads
+
+Usage:
+    python benchmarks/bench_models.py --count 100000
+'''
+
+import logging
+import argparse
+from time import perf_counter
+
+from sparkpy.models.membership import SparkMembership
+from sparkpy.models.message import SparkMessage
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+
+
+class FakeSpark(object):
+    session = None
+
+
+def messages(count, extra=False):
+    room_id = uuid_to_api_id(uuid_v4_str(), 'rooms')
+    data = [{'id': uuid_to_api_id(uuid_v4_str(), 'messages'),
+             'roomId': room_id,
+             'roomType': 'group',
+             'text': 'A message which is about as long as a typical one',
+             'personId': 'Y2lzY29zcGFyazovL3VzL1BFT1BMRS8wMDAwMDAwMA',
+             'personEmail': 'someone@example.com',
+             'created': '2017-08-26T12:01:36.373Z'} for _ in range(count)]
+    if extra:
+        # Fields added to the API since the models were written
+        for item in data:
+            item['updated'] = item['created']
+    return data
+
+
+def memberships(count):
+    room_id = uuid_to_api_id(uuid_v4_str(), 'rooms')
+    return [{'id': uuid_to_api_id(uuid_v4_str(), 'memberships'),
+             'roomId': room_id,
+             'personId': 'Y2lzY29zcGFyazovL3VzL1BFT1BMRS8wMDAwMDAwMA',
+             'personEmail': f'{i}@example.com',
+             'personOrgId': 'ORG',
+             'personDisplayName': f'Person {i}',
+             'isModerator': True,
+             'created': '2017-08-26T12:01:36.373Z'} for i in range(count)]
+
+
+def timed(cls, data, repeat):
+    parent = FakeSpark()
+    best = float('inf')
+    for _ in range(repeat):
+        started = perf_counter()
+        for item in data:
+            cls(parent=parent, **item)
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    # Warnings are still formatted for unknown fields, only not printed
+    logging.basicConfig(level=logging.CRITICAL)
+    scenarios = (('messages', SparkMessage, messages(args.count)),
+                 ('messages, unknown field', SparkMessage,
+                  messages(args.count, extra=True)),
+                 ('memberships', SparkMembership, memberships(args.count)))
+    for name, cls, data in scenarios:
+        elapsed = timed(cls, data, args.repeat)
+        print(f'{name:<24} {elapsed:6.2f} s  '
+              f'{args.count / elapsed:9,.0f} models/s')
+
+
+if __name__ == '__main__':
+    main()
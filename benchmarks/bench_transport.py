@@ -0,0 +1,97 @@
+'''
+Compare sparkpy transports under concurrency
+
+Every transport serves the same workload: `--threads` threads sharing one
+:class:`SparkSession` and making `--requests` GETs between them against a
+local HTTP server. The in-memory transport shows the cost of the session
+itself, without any network I/O.
+
+Usage:
+    python benchmarks/bench_transport.py --threads 32 --requests 5000
+
+.. note:: httpx only negotiates HTTP/2 over TLS, so against the local
+          plain HTTP server it runs HTTP/1.1. Point `--url` at a TLS
+          endpoint to measure multiplexing.
+'''
+
+import argparse
+import json
+import threading
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sparkpy.session import SparkSession
+from sparkpy.transport import (RequestsTransport, HttpxTransport,
+                               InMemoryTransport)
+
+BODY = json.dumps({'items': [{'id': str(i), 'title': 'A room'}
+                             for i in range(50)]}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def run(name, transport, url, threads, requests):
+    session = SparkSession('TOKEN', transport=transport, coalesce=False)
+    started = perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        # Distinct urls, so nothing is shared between requests
+        for response in pool.map(lambda i: session.get(f'{url}?i={i}'),
+                                 range(requests)):
+            assert response.status_code == 200
+    elapsed = perf_counter() - started
+    print(f'{name:<10} {requests / elapsed:>10.0f} req/s '
+          f'{elapsed * 1e6 / requests:>8.0f} us/req')
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--url', help='Benchmark against this url instead '
+                                      'of a local server')
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/v1/rooms'
+
+    transports = [('requests', lambda: RequestsTransport(
+        pool_maxsize=args.threads, thread_safe=True))]
+    try:
+        import httpx  # noqa: F401
+        transports.append(('httpx', lambda: HttpxTransport(
+            http2=True, max_connections=args.threads)))
+    except ImportError:
+        print('httpx is not installed, skipping HttpxTransport')
+    memory = InMemoryTransport()
+    memory.add('GET', url, lambda request: (200, BODY))
+    transports.append(('in-memory', lambda: memory))
+
+    print(f'{args.threads} threads, {args.requests} requests')
+    for name, factory in transports:
+        run(name, factory(), url, args.threads, args.requests)
+
+
+if __name__ == '__main__':
+    main()
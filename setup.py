@@ -5,7 +5,7 @@ setup(
     author='Paul Anholt',
     author_email='panholt@gmail.com',
     version='0.1dev',
-    packages=['sparkpy', 'sparkpy.models'],
+    packages=['sparkpy', 'sparkpy.models', 'sparkpy.exceptions'],
     license='MIT',
     url='https://github.com/panholt/sparkpy',
     long_description=open('README.rst').read(),
@@ -6,27 +6,37 @@
 .. moduleauthor:: Paul Anholt <panholt@gmail.com>
 '''
 
-import logging
-from .spark import Spark
-from .models.file import SparkFile
-from .models.license import SparkLicense
-from .models.message import SparkMessage
-from .models.organization import SparkOrganization
-from .models.people import SparkPerson
-from .models.role import SparkRole
-from .models.room import SparkRoom
-from .models.team import SparkTeam
-from .models.webhook import SparkWebhook
-from .models.membership import SparkMembership, SparkTeamMembership
+import importlib
 
-__all__ = ['Spark',
-           'SparkFile',
-           'SparkLicense',
-           'SparkMembership',
-           'SparkMessage',
-           'SparkOrganization',
-           'SparkPerson',
-           'SparkRole',
-           'SparkTeam',
-           'SparkTeamMembership',
-           'SparkWebhook']
+# Public names and the modules defining them. Nothing is imported until a
+# name is first used, so `import sparkpy` stays cheap for short lived
+# scripts that only need part of the package.
+_EXPORTS = {'Spark': '.spark',
+            'SparkFile': '.models.file',
+            'SparkLicense': '.models.license',
+            'SparkMembership': '.models.membership',
+            'SparkMessage': '.models.message',
+            'SparkOrganization': '.models.organization',
+            'SparkPerson': '.models.people',
+            'SparkRole': '.models.role',
+            'SparkRoom': '.models.room',
+            'SparkTeam': '.models.team',
+            'SparkTeamMembership': '.models.membership',
+            'SparkWebhook': '.models.webhook'}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module, __name__), name)
+    # Cache it, later lookups don't reach __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
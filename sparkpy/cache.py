@@ -0,0 +1,195 @@
+'''
+sparkpy.cache
+~~~~~~~~~~~~~
+Thread safe helpers used to avoid repeating identical requests
+
+:class:`SparkTTLCache` is a size bounded LRU cache whose entries expire.
+:class:`SparkQueryCache` holds listings keyed by resource and query params
+with a lifetime per resource, and drops them when the resource is written.
+:class:`SparkSingleFlight` lets concurrent callers asking for the same key
+share a single call and its result.
+'''
+
+import threading
+from time import monotonic
+from urllib.parse import urlparse
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .retry import endpoint
+from .utils import is_api_id
+
+
+class SparkTTLCache(object):
+    '''
+    LRU cache with per entry expiry
+
+    :param maxsize: (optional) Maximum number of entries, the least recently
+                    used entry is evicted beyond it. Default: 1024
+    :type maxsize: int
+    :param ttl: (optional) Default lifetime of an entry in seconds.
+                Default: 60
+    :type ttl: float
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        ''' The value for `key` if present and not expired '''
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires < monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        '''
+        Store `value` for `ttl` seconds, or the cache's default ttl
+        '''
+        expires = monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def invalidate(self, predicate):
+        '''
+        Remove every entry whose key matches `predicate(key)`
+
+        :return: The number of entries removed
+        :rtype: int
+        '''
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        return
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f'SparkTTLCache({self.maxsize}, {self.ttl})'
+
+
+class SparkQueryCache(SparkTTLCache):
+    '''
+    Cache of listings. Keys are tuples starting with the resource, ie:
+    `memberships`, and the query params as sorted `(name, value)` pairs.
+
+    :param ttl: Lifetime in seconds of every entry, or a mapping of resource
+                to lifetime. Resources missing from the mapping use its
+                `default` entry, if any, or are not cached.
+    :type ttl: float or dict
+    :param maxsize: (optional) Maximum number of entries. Default: 1024
+    :type maxsize: int
+    '''
+
+    def __init__(self, ttl, maxsize=1024):
+        if isinstance(ttl, dict):
+            self.ttls = dict(ttl)
+            ttl = self.ttls.pop('default', 0)
+        else:
+            self.ttls = {}
+        super().__init__(maxsize=maxsize, ttl=ttl)
+
+    def ttl_for(self, resource):
+        ''' Lifetime of a resource's entries, `0` if they aren't cached '''
+        return self.ttls.get(resource, self.ttl)
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl_for(key[0])
+        if ttl:
+            super().set(key, value, ttl=ttl)
+        return
+
+    def invalidate_url(self, url):
+        '''
+        Drop the listings a write to `url` may change: those of its
+        resource, and those filtered by an id in its path, ie: the
+        memberships of a deleted room
+
+        :return: The number of entries removed
+        :rtype: int
+        '''
+        resource = endpoint(url)
+        ids = {part for part in urlparse(url).path.split('/')
+               if is_api_id(part)}
+
+        def stale(key):
+            return key[0] == resource or \
+                any(value in ids for name, value in key[1])
+        return self.invalidate(stale)
+
+    def __repr__(self):
+        return f'SparkQueryCache({self.maxsize}, {self.ttl}, {self.ttls})'
+
+
+class SparkSingleFlight(object):
+    '''
+    Deduplicate concurrent calls
+
+    The first caller for a key runs the function, callers arriving while it
+    is in flight wait for and receive the same result or exception.
+    '''
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        '''
+        Call `fn()`, or wait on the in-flight call for `key`
+
+        :param key: A hashable key identifying the call
+        :param fn: A callable taking no arguments
+        :return: The result of the call
+        '''
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+        return future.result()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __repr__(self):
+        return 'SparkSingleFlight'
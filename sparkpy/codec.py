@@ -0,0 +1,140 @@
+'''
+sparkpy.codec
+~~~~~~~~~~~~~
+JSON encoding and decoding for request bodies and responses
+
+The fastest installed backend is used, `orjson`, then `ujson`, falling back
+to the standard library. Another can be selected with :func:`use`.
+
+:func:`iter_items` decodes the `items` of a listing incrementally from a
+streamed response, so models can be built before the page has finished
+downloading and the whole page is never held as one decoded list.
+
+Usage:
+    >>> from sparkpy import codec
+    >>> codec.backend
+    'orjson'
+    >>> codec.use('json')
+'''
+
+import re
+import json
+import codecs
+import logging
+
+log = logging.getLogger('sparkpy.codec')
+
+# Backends in order of preference
+BACKENDS = ('orjson', 'ujson', 'json')
+
+# Spark listings are `{"items": [...]}`, the items key comes first
+ITEMS_START = re.compile(r'"items"\s*:\s*\[')
+WHITESPACE = ' \t\n\r,'
+
+backend = None
+loads = None
+dumps = None
+
+
+def _orjson():
+    import orjson
+    return orjson.loads, orjson.dumps
+
+
+def _ujson():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+    return ujson.loads, dumps
+
+
+def _json():
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj):
+        return encoder.encode(obj).encode('utf-8')
+    return json.loads, dumps
+
+
+_LOADERS = {'orjson': _orjson, 'ujson': _ujson, 'json': _json}
+
+
+def use(name):
+    '''
+    Select the JSON backend
+
+    :param name: One of `orjson`, `ujson` or `json`
+    :type name: str
+    :raises ImportError: If the backend isn't installed
+    '''
+    global backend, loads, dumps
+    if name not in _LOADERS:
+        raise ValueError(f'Unknown JSON backend {name}, use one of {BACKENDS}')
+    loads, dumps = _LOADERS[name]()
+    backend = name
+    log.debug('Using the %s JSON backend', name)
+    return
+
+
+for _name in BACKENDS:
+    try:
+        use(_name)
+        break
+    except ImportError:
+        continue
+
+
+def iter_items(chunks, key_pattern=ITEMS_START):
+    '''
+    Incrementally decode the items of a listing
+
+    :param chunks: An iterable of `bytes`, ie: `response.iter_content(65536)`
+    :yields: Each decoded item, as soon as it has been received
+    :raises ValueError: If the body isn't a listing or is truncated
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    # Find the start of the items array
+    while True:
+        match = key_pattern.search(buf)
+        if match:
+            pos = match.end()
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('Response is not a listing of items')
+        buf += utf8.decode(chunk)
+
+    exhausted = False
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE:
+            pos += 1
+        if pos < len(buf):
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # Incomplete, fall through and read more
+                if exhausted:
+                    raise
+            else:
+                # A trailing number may continue in the next chunk
+                if end < len(buf) or exhausted:
+                    yield item
+                    pos = end
+                    continue
+        if exhausted:
+            raise ValueError('Truncated listing')
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buf += utf8.decode(b'', final=True)
+        else:
+            # Drop what has been decoded so the buffer stays one item long
+            buf = buf[pos:] + utf8.decode(chunk)
+            pos = 0
@@ -0,0 +1,9 @@
+'''
+sparkpy.exceptions
+~~~~~~~~~~~~~~~~~~
+Exceptions raised by sparkpy
+'''
+
+from .spark_exceptions import SparkAPIException, SparkCircuitOpenError
+
+__all__ = ['SparkAPIException', 'SparkCircuitOpenError']
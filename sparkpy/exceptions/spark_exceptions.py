@@ -1,6 +1,3 @@
-from requests.exceptions import JSONDecodeError
-
-
 class SparkAPIException(Exception):
     ''' Base for Cisco Spark API Errors '''
 
@@ -13,7 +10,7 @@ class SparkAPIException(Exception):
         msg = [f'Spark HTTP Response: {self.response.status_code}',
                f'Spark URL: {self.response.request.url}']
         if self.response.request.body:
-            msg.append(f'Payload: {self.request.body}')
+            msg.append(f'Payload: {self.response.request.body}')
         try:
             data = self.response.json()
             msg.append(data.get('message'))
@@ -23,9 +20,27 @@ class SparkAPIException(Exception):
                 if error['description'] not in data.get('message'):
                     msg.append(f'Further details: {error}')
 
-        except JSONDecodeError:
+        except ValueError:
+            # Not JSON, whichever codec decoded it
             pass
-        return ' '.join(msg)
+        return ' '.join(str(part) for part in msg if part)
+
+
+class SparkCircuitOpenError(Exception):
+    '''
+    Raised without making a request when an endpoint's circuit breaker is
+    open because the API has been failing
+
+    Attributes:
+        endpoint -- the API resource, ie: `rooms`
+        retry_in -- seconds until a trial request will be allowed
+    '''
+
+    def __init__(self, endpoint, retry_in):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(f'The {endpoint} endpoint is failing, '
+                         f'retry in {retry_in:.1f} seconds')
 
 
 # Specific exceptions below are for catching purposes.
@@ -0,0 +1,276 @@
+'''
+sparkpy.export
+~~~~~~~~~~~~~~
+Streams the message history of Cisco Spark rooms to disk
+
+Messages are written page by page as they are received from the API, so
+memory use is bounded by a single page (or a single part for columnar
+formats) regardless of the size of the room. Progress is recorded in a
+checkpoint file next to the output, and an interrupted export picks up from
+the last page that was safely written.
+
+Usage:
+    >>> from sparkpy import Spark
+    >>> from sparkpy.export import SparkExporter, export_rooms
+    >>> spark = Spark()
+    >>> room = spark.rooms[0]
+    >>> SparkExporter(room, 'room.jsonl.gz').run()
+    >>> # Columnar export, requires pyarrow
+    >>> SparkExporter(room, 'room_parquet', fmt='parquet').run()
+    >>> # Export many rooms across a process pool
+    >>> export_rooms(['...', '...'], 'archive/', processes=4)
+'''
+
+import os
+import gzip
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .models.container import paginate
+from .models.message import SparkMessage
+from .utils import api_id_to_uuid
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+log = logging.getLogger('sparkpy.export')
+
+# Column layout used for the columnar formats
+MESSAGE_FIELDS = ('id', 'roomId', 'roomType', 'personId', 'personEmail',
+                  'created', 'text', 'markdown', 'html', 'files',
+                  'mentionedPeople')
+LIST_FIELDS = ('files', 'mentionedPeople')
+
+FORMATS = {'jsonl': '.jsonl.gz',
+           'parquet': '',
+           'arrow': ''}
+
+
+class SparkExporter(object):
+    '''
+    Export the messages of a single room
+
+    :param room: The room to export
+    :type room: :class:`SparkRoom <SparkRoom>`
+    :param path: Output file for `jsonl`, or output directory for the
+                 columnar formats which are written as numbered part files
+    :type path: str
+    :param fmt: (optional) One of `jsonl`, `parquet` or `arrow`
+                (Arrow IPC). Default: `jsonl`
+    :type fmt: str
+    :param compress: (optional) gzip the `jsonl` output. Default: `True`
+    :type compress: bool
+    :param per_page: (optional) Messages requested per page. Default: 500
+    :type per_page: int
+    :param pages_per_part: (optional) Pages buffered before a columnar part
+                           file is written. Default: 10
+    :type pages_per_part: int
+
+    .. note:: The columnar formats require the optional `pyarrow` package
+    '''
+
+    def __init__(self,
+                 room,
+                 path,
+                 fmt='jsonl',
+                 compress=True,
+                 per_page=500,
+                 pages_per_part=10):
+        if fmt not in FORMATS:
+            raise ValueError(f'fmt must be one of {", ".join(FORMATS)}')
+        if fmt != 'jsonl' and pyarrow is None:
+            raise ImportError(f'The {fmt} format requires pyarrow')
+        self._room = room
+        self._path = path
+        self._fmt = fmt
+        self._compress = compress
+        self._per_page = per_page
+        self._pages_per_part = pages_per_part
+        self._state = None
+
+    @property
+    def path(self):
+        ''' The output file or directory '''
+        return self._path
+
+    @property
+    def checkpoint_path(self):
+        ''' The file used to record the progress of the export '''
+        return self._path.rstrip(os.sep) + '.checkpoint'
+
+    @property
+    def count(self):
+        ''' The number of messages written so far '''
+        return self._state['count'] if self._state else 0
+
+    def run(self):
+        '''
+        Run the export, resuming from the checkpoint if one exists
+
+        :return: The total number of messages exported
+        :rtype: int
+        '''
+        self._state = self._read_checkpoint()
+        if self._state['done']:
+            log.debug('%s has already been exported', self._path)
+            return self.count
+        params = dict(self._room.message_params, max=self._per_page)
+        pages = paginate(self._room.session,
+                         SparkMessage.API_BASE,
+                         params=params,
+                         start=self._state['next_page'])
+        if self._fmt == 'jsonl':
+            self._write_jsonl(pages)
+        else:
+            self._write_columnar(pages)
+        return self.count
+
+    def _write_jsonl(self, pages):
+        # Truncate anything written after the last checkpoint
+        # so a resumed export never duplicates messages
+        mode = 'r+b' if os.path.exists(self._path) else 'wb'
+        with open(self._path, mode) as f:
+            f.truncate(self._state['offset'])
+            f.seek(self._state['offset'])
+            for items, next_page in pages:
+                lines = ''.join(json.dumps(item, separators=(',', ':')) + '\n'
+                                for item in items).encode('utf-8')
+                # Each page is its own gzip member, a multi-member
+                # gzip file is read back as a single stream
+                f.write(gzip.compress(lines) if self._compress else lines)
+                f.flush()
+                os.fsync(f.fileno())
+                self._checkpoint(next_page,
+                                 count=self.count + len(items),
+                                 offset=f.tell())
+        return
+
+    def _write_columnar(self, pages):
+        os.makedirs(self._path, exist_ok=True)
+        rows = []
+        buffered = 0
+        for items, next_page in pages:
+            rows.extend(items)
+            buffered += 1
+            if buffered >= self._pages_per_part or not next_page:
+                self._write_part(rows)
+                self._checkpoint(next_page,
+                                 count=self.count + len(rows),
+                                 parts=self._state['parts'] + 1)
+                rows = []
+                buffered = 0
+        return
+
+    def _write_part(self, rows):
+        columns = {field: [] for field in MESSAGE_FIELDS}
+        for row in rows:
+            for field in MESSAGE_FIELDS:
+                value = row.get(field)
+                if field in LIST_FIELDS and value is not None:
+                    value = [str(item) for item in value]
+                columns[field].append(value)
+        table = pyarrow.table({field: columns[field]
+                               for field in MESSAGE_FIELDS})
+        part = self._state['parts']
+        if self._fmt == 'parquet':
+            from pyarrow import parquet
+            parquet.write_table(table, os.path.join(
+                self._path, f'part-{part:05d}.parquet'))
+        else:
+            fname = os.path.join(self._path, f'part-{part:05d}.arrow')
+            with pyarrow.OSFile(fname, 'wb') as sink:
+                with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+        return
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            log.info('Resuming export of %s from %s messages',
+                     self._path, state['count'])
+            return state
+        except FileNotFoundError:
+            return {'room_id': self._room.id,
+                    'next_page': None,
+                    'count': 0,
+                    'offset': 0,
+                    'parts': 0,
+                    'done': False}
+
+    def _checkpoint(self, next_page, **kwargs):
+        self._state.update(kwargs)
+        self._state['next_page'] = next_page
+        self._state['done'] = next_page is None
+        # Write and rename so a crash never leaves a partial checkpoint
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.checkpoint_path)
+        return
+
+    def __repr__(self):
+        return f'SparkExporter("{self._path}")'
+
+
+def _export_room(token, room_id, path, kwargs):
+    '''
+    Process pool worker. Sessions can't be shared across processes so
+    each worker creates its own :class:`Spark <Spark>` instance
+    '''
+    from .spark import Spark
+    from .models.room import SparkRoom
+    spark = Spark(token)
+    room = SparkRoom(room_id, parent=spark)
+    return room_id, SparkExporter(room, path, **kwargs).run()
+
+
+def export_rooms(room_ids, directory, token=None, processes=None, **kwargs):
+    '''
+    Export several rooms in parallel across a process pool
+
+    Each room is written to `directory` and named after the room's uuid.
+    Rooms that fail are logged and skipped, re-running the export resumes
+    them from their checkpoints.
+
+    :param room_ids: Cisco Spark room ids to export
+    :type room_ids: list
+    :param directory: The output directory
+    :type directory: str
+    :param token: (optional) The bearer token, defaults to the
+                  `SPARK_TOKEN` environment variable
+    :type token: str
+    :param processes: (optional) Number of worker processes.
+                      Defaults to the number of CPUs
+    :type processes: int
+    :param \\**kwargs: Passed through to :class:`SparkExporter`
+
+    :return: Mapping of room id to the number of messages exported
+    :rtype: dict
+    '''
+    token = token or os.environ.get('SPARK_TOKEN')
+    if not token:
+        raise ValueError('A bearer token is required')
+    os.makedirs(directory, exist_ok=True)
+    suffix = FORMATS[kwargs.get('fmt', 'jsonl')]
+    if not kwargs.get('compress', True):
+        suffix = suffix.replace('.gz', '')
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(_export_room,
+                               token,
+                               room_id,
+                               os.path.join(directory,
+                                            api_id_to_uuid(room_id) + suffix),
+                               kwargs): room_id
+                   for room_id in room_ids}
+        for future in as_completed(futures):
+            try:
+                room_id, count = future.result()
+                results[room_id] = count
+            except Exception:
+                log.exception('Failed to export room %s', futures[future])
+    return results
@@ -5,12 +5,19 @@ Contains classes to build base Cisco Spark models
 '''
 
 import logging
+import weakref
+from time import monotonic
+from contextlib import contextmanager
 from abc import ABC, abstractproperty, abstractmethod
 from ..models.time import SparkTime
+from ..exceptions.spark_exceptions import SparkAPIException
 from ..utils import decode_api_id, is_uuid, is_api_id, uuid_to_api_id
 
 log = logging.getLogger('sparkpy.base')
 
+# Seconds between warnings about the same unexpected field of a model
+UNKNOWN_FIELD_INTERVAL = 60
+
 
 class SparkBase(ABC, object):
     '''
@@ -32,13 +39,43 @@ class SparkBase(ABC, object):
         '''
         pass
 
+    # Seconds before loaded properties are considered stale and revalidated
+    # on access. `None` disables refreshing, opt in per model, ie:
+    # `SparkRoom.REFRESH_TTL = 300`
+    REFRESH_TTL = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if isinstance(getattr(cls, 'PROPERTIES', None), dict):
+            cls._schema = SparkSchema(cls)
+
     def __init__(self, *args, **kwargs):
-        self._id = ''
-        self._path = kwargs.pop('path')
-        self._parent = kwargs.pop('parent', False)
-        self._uuid = None
-        self._loaded = False
-        self._loaded_at = None
+        parent = kwargs.pop('parent', False)
+        # The client at the root of the parent chain, containers pass theirs
+        root = kwargs.pop('root', None)
+        if root is None:
+            root = root_of(parent)
+        if parent is not root and getattr(root, 'weak_parents', False):
+            # The root is held directly, so only the parent may be released
+            parent = weakref.ref(parent)
+        # Written to the instance dict directly, none are properties
+        object.__getattribute__(self, '__dict__').update(
+            _id='',
+            _path=kwargs.pop('path'),
+            _parent=parent,
+            _root=root,
+            _uuid=None,
+            _loaded=False,
+            _loaded_at=None,
+            # monotonic() of the last load, and the validators of that
+            # response (not None, `__getattribute__` treats None as missing)
+            _fetched=0.0,
+            _etag='',
+            _last_modified='',
+            # Pending changes to mutable properties, see `save`
+            _dirty={},
+            _original={},
+            _batching=0)
         if args:
             self._load_from_id(*args)
         elif 'id' in kwargs:
@@ -46,9 +83,10 @@ class SparkBase(ABC, object):
             self._load_data(kwargs)
         else:
             raise ValueError('A valid Spark ID is required')
-        _id = decode_api_id(self.id)
-        self._uuid = _id['uuid']
-        self._path = _id['path']
+        if self._uuid is None:
+            _id = decode_api_id(self.id)
+            self._uuid = _id['uuid']
+            self._path = _id['path']
 
     @property
     def id(self):
@@ -87,6 +125,18 @@ class SparkBase(ABC, object):
         self._loaded_at = val
         return
 
+    @property
+    def stale(self):
+        '''
+        Returns `True` if the properties were loaded more than
+        `REFRESH_TTL` seconds ago
+
+        :type: bool
+        '''
+        ttl = type(self).REFRESH_TTL
+        return bool(ttl is not None and self._fetched and
+                    monotonic() - self._fetched > ttl)
+
     @property
     def uuid(self):
         return self._uuid
@@ -97,7 +147,19 @@ class SparkBase(ABC, object):
 
     @property
     def parent(self):
-        return self._parent
+        parent = self._parent
+        if isinstance(parent, weakref.ref):
+            # `False` once the parent has been released
+            parent = parent() or False
+        return parent
+
+    @property
+    def root(self):
+        '''
+        The client at the root of the parent chain, ie: the
+        :class:`Spark <Spark>` instance. Resolved when the model is created.
+        '''
+        return self._root
 
     @property
     def session(self):
@@ -109,8 +171,12 @@ class SparkBase(ABC, object):
 
     @property
     def lastActivity(self):
-        if self._lastActivity:
-            return SparkTime(self._lastActivity)
+        value = self._lastActivity
+        if value and not isinstance(value, SparkTime):
+            # Wrap once and keep it, parsing is deferred by SparkTime
+            value = SparkTime(value)
+            super().__setattr__('_lastActivity', value)
+        return value or None
 
     @lastActivity.setter
     def lastActivity(self, val):
@@ -119,76 +185,159 @@ class SparkBase(ABC, object):
 
     @property
     def created(self):
-        if self._created:
-            return SparkTime(self._created)
+        value = self._created
+        if value and not isinstance(value, SparkTime):
+            value = SparkTime(value)
+            super().__setattr__('_created', value)
+        return value or None
 
     @created.setter
     def created(self, val):
         self._created = val
         return
 
+    @property
+    def dirty(self):
+        '''
+        Mutable properties which have been changed locally
+        but not yet sent to the Cisco Spark API
+
+        :type: dict
+        '''
+        return dict(self._dirty)
+
     @abstractmethod
-    def update(self, data):
+    def update(self, **data):
         '''
         Parent class must implement this method to accept
-        a mapping of updates and process them accoringly.
+        a mapping of updates and send them in a single request.
 
         .. note:: Parent class must be able to handle updates for any
                   properties defined as mutable in class.properties
 
-        :arg data: A dictionary of updates
+        :arg data: The updated properties as keyword arguments
         :raises: `ValueError` or `AttributeError`
         :return: None
         '''
         pass
 
+    def save(self):
+        '''
+        Send all pending changes to the Cisco Spark API in a single `PUT`.
+        If the update fails the changes are kept pending.
+
+        :return: None
+        :raises: `SparkAPIException`
+        '''
+        if self._dirty:
+            # Only cleared once the update succeeded
+            self.update(**self._dirty)
+            self._dirty.clear()
+            self._original.clear()
+        return
+
+    @contextmanager
+    def batch_update(self):
+        '''
+        Collect property changes and send them as one update on exit.
+        If the block or the update raises, the pending changes are
+        discarded and the previous values restored.
+
+        Usage:
+            >>> with person.batch_update():
+            ...     person.firstName = 'Paul'
+            ...     person.lastName = 'Anholt'
+            ...     person.nickName = 'Paul'
+        '''
+        self._batching += 1
+        try:
+            yield self
+        except BaseException:
+            self._batching -= 1
+            if not self._batching:
+                self._rollback()
+            raise
+        else:
+            self._batching -= 1
+            if not self._batching:
+                try:
+                    self.save()
+                except Exception:
+                    self._rollback()
+                    raise
+
+    def refresh(self, force=False):
+        '''
+        Revalidate the properties with the Cisco Spark API if they are stale
+
+        Uses a conditional `GET` when the last response provided an `ETag`
+        or `Last-Modified` header, so an unchanged object costs a `304`
+        without a body.
+
+        :param force: Refresh even if the properties are not stale
+        :type force: bool
+        :return: None
+        '''
+        if force or not self.loaded or self.stale:
+            previous = self._fetched
+            # Claim the refresh so property access during it doesn't recurse
+            super().__setattr__('_fetched', monotonic())
+            try:
+                self._fetch_data()
+            except Exception:
+                super().__setattr__('_fetched', previous)
+                raise
+        return
+
     def _fetch_data(self):
         '''
         Query the Cisco Spark API to retrieve
         and load the objects properties
         '''
 
-        if self.parent:
-            resp = self.session.get(self.url)
-            if resp.status_code == 200:
+        if self._get_parent():
+            headers = {}
+            if self._loaded:
+                if self._etag:
+                    headers['If-None-Match'] = self._etag
+                if self._last_modified:
+                    headers['If-Modified-Since'] = self._last_modified
+            resp = self.session.get(self.url, headers=headers)
+            if resp.status_code == 304:
+                log.debug('%s has not been modified', self)
+                self._touch()
+            elif resp.status_code == 200:
+                setter = super().__setattr__
+                setter('_etag', resp.headers.get('ETag', ''))
+                setter('_last_modified', resp.headers.get('Last-Modified', ''))
                 self._load_data(resp.json())
+            else:
+                raise SparkAPIException(resp)
         else:
             raise Exception('Cannot fetch data without a session')
         return
 
+    def _touch(self):
+        ''' Mark the loaded properties as fresh '''
+        setter = super().__setattr__
+        setter('_loaded_at', SparkTime())
+        setter('_fetched', monotonic())
+        return
+
+    def _rollback(self):
+        setter = super().__setattr__
+        for key, value in self._original.items():
+            setter(key, value)
+        self._dirty.clear()
+        self._original.clear()
+        return
+
     def _load_data(self, data):
         '''
         Load the data provided as **kwargs
         From the properties defined in self.PROPERTIES
         '''
-        # keep a clean __setattr__
-        setter = super().__setattr__
-        # Check and warn for any extra kwargs
-        interlopers = data.keys() - self.PROPERTIES.keys()
-        for interloper in interlopers:
-            log.warning('Extra kwarg provided: %s value: %s',
-                        interloper, data[interloper])
-        # Set all the provided kwargs
-        for key, properties in self.PROPERTIES.items():
-            value = data.get(key)
-            if value:
-                if properties.item_class and isinstance(value, list):
-                    value = [properties.item_class(item, 
-                                                   parent=self._get_parent())
-                             for item in value]
-                setter(key, value)
-            elif properties.optional:
-                setter(key, None)
-            else:
-                raise TypeError(f'{self} needs keyword-only argument {key}')
-
-        # Check if all required properties are set
-        if all([key in data for key in self.PROPERTIES
-                if not self.PROPERTIES[key].optional]):
-
-            # Set the _loaded flag to True and timestamp it
-            setter('_loaded', True)
-            setter('_loaded_at', SparkTime())
+        self._schema.load(self, data)
         return
 
     def _load_from_id(self, _id):
@@ -223,15 +372,11 @@ class SparkBase(ABC, object):
         return
 
     def _get_session(self):
-        return self._get_parent().session
+        return object.__getattribute__(self, '__dict__')['_root'].session
 
     def _get_parent(self):
-        parent = getattr(self, 'parent', None)
-        #  Get to the root parent
-        while getattr(parent, 'parent', None):
-            parent = parent.parent
-        return parent
-
+        ''' The root client, see :attr:`root` '''
+        return object.__getattribute__(self, '__dict__')['_root']
 
     def delete(self):
         '''
@@ -279,6 +424,12 @@ class SparkBase(ABC, object):
             attr = None
         # Return the attribute if it exists
         if attr is not None:  # Don't swallow bools here
+            cls = type(self)
+            if cls.REFRESH_TTL is not None and name in cls.PROPERTIES and \
+               self.stale:
+                log.debug('refreshing data because of %s', name)
+                self.refresh()
+                return getter(name)
             return attr
         # Check if attribute is valid
         try:
@@ -302,13 +453,19 @@ class SparkBase(ABC, object):
 
     def __setattr__(self, key, value):
         setter = super().__setattr__
-        if self.PROPERTIES.get(key):
-            if not self.loaded:
-                self._fetch_data()
-            if self.PROPERTIES[key].mutable:
-                self.update(**{key: value})
-            else:
+        prop = self.PROPERTIES.get(key)
+        if prop:
+            if not prop.mutable:
                 raise AttributeError(f'{self}.{key} is read only')
+            if key not in self._original:
+                self._original[key] = self.__dict__.get(key)
+            self._dirty[key] = value
+            if not self._batching:
+                try:
+                    self.save()
+                except Exception:
+                    self._rollback()
+                    raise
         setter(key, value)
 
     def __eq__(self, other):
@@ -343,6 +500,124 @@ class SparkBase(ABC, object):
         return hash(self.id)
 
 
+class SparkSchema(object):
+    '''
+    A model's `PROPERTIES` compiled once when the class is created, so
+    loading an object is a single pass over precomputed fields
+
+    :param cls: The model class
+    '''
+
+    def __init__(self, cls):
+        self.cls = cls
+        properties = cls.PROPERTIES
+        self.known = frozenset(properties)
+        self.required = frozenset(key for key, prop in properties.items()
+                                  if not prop.optional)
+        # Properties of the class (ie: `created`) must be set through their
+        # setter, others are written straight to the instance dict. The id
+        # is decoded once by the loader rather than by its setter.
+        self.fields = tuple((key, prop.optional, prop.item_class,
+                             key != 'id' and _is_descriptor(cls, key))
+                            for key, prop in properties.items())
+        # (last warned, suppressed since) for each unexpected field
+        self._unknown = {}
+
+    def load(self, obj, data):
+        ''' Set the properties of `obj` from the API data '''
+        setter = object.__setattr__
+        attrs = object.__getattribute__(obj, '__dict__')
+        # Don't clobber local changes waiting to be saved
+        dirty = attrs['_dirty']
+        keys = data.keys()
+        if not keys <= self.known:
+            self._warn_unknown(keys - self.known, data)
+        for key, optional, item_class, descriptor in self.fields:
+            if dirty and key in dirty:
+                continue
+            value = data.get(key)
+            if value:
+                if item_class is not None and isinstance(value, list):
+                    parent = obj._get_parent()
+                    value = [item_class(item, parent=parent)
+                             for item in value]
+            elif optional:
+                value = None
+            else:
+                raise TypeError(f'{obj} needs keyword-only argument {key}')
+            if key == 'id':
+                self._load_id(attrs, value)
+            elif descriptor:
+                setter(obj, key, value)
+            else:
+                attrs[key] = value
+        # Every required property was present, or the loop would have raised
+        if self.required <= keys:
+            attrs['_loaded'] = True
+            obj._touch()
+        return
+
+    @staticmethod
+    def _load_id(attrs, value):
+        try:
+            decoded = decode_api_id(value)
+        except (ValueError, TypeError, AttributeError):
+            raise ValueError('id Must be a valid Cisco Spark API ID')
+        attrs['_id'] = value
+        attrs['_uuid'] = decoded['uuid']
+        attrs['_path'] = decoded['path']
+        return
+
+    def _warn_unknown(self, keys, data):
+        '''
+        Warn about fields missing from `PROPERTIES`, at most once per field
+        every `UNKNOWN_FIELD_INTERVAL` seconds
+        '''
+        now = monotonic()
+        for key in keys:
+            warned, suppressed = self._unknown.get(key, (None, 0))
+            if warned is not None and now - warned < UNKNOWN_FIELD_INTERVAL:
+                self._unknown[key] = (warned, suppressed + 1)
+                continue
+            self._unknown[key] = (now, 0)
+            log.warning('Extra kwarg provided to %s: %s value: %s%s',
+                        self.cls.__name__, key, data[key],
+                        f' ({suppressed} more since last warned)'
+                        if suppressed else '')
+        return
+
+    def __repr__(self):
+        return f'SparkSchema({self.cls.__name__})'
+
+
+def root_of(parent):
+    '''
+    The client at the root of a parent chain. Models and containers know
+    theirs, so at most one step is taken for them.
+
+    :param parent: A client, model or container, or `False`
+    :return: The root, or `parent` itself if it has no parent
+    '''
+    # Identity checks, the truth of a container would load it
+    obj = parent
+    while obj is not None and obj is not False:
+        root = getattr(obj, 'root', None)
+        if root is not None:
+            return root
+        parent = getattr(obj, 'parent', None)
+        if parent is None or parent is False:
+            return obj
+        obj = parent
+    return obj
+
+
+def _is_descriptor(cls, key):
+    for klass in cls.__mro__:
+        if key in klass.__dict__:
+            return hasattr(klass.__dict__[key], '__set__')
+    return False
+
+
 class SparkProperty(object):
     '''
     Class that represents a Cisco Spark API property
@@ -13,6 +13,8 @@ Usage:
         ... print(room)
     >>> # Access the most recently created room
     >>> room = spark.rooms[0]
+    >>> # Containers are lazy queries, this is a single request
+    >>> recent = spark.rooms.where(type='group').order_by('lastactivity').limit(10)
     >>> # dictionary style lookup
     >>> room = spark.rooms['...'] # Some room id
     >>> # Room is lazy loaded, so no attributes are set
@@ -44,10 +46,56 @@ Usage:
 '''
 
 import re
-from collections import MutableSequence
-from .time import SparkTime
-from json.decoder import JSONDecodeError
-from ..utils import is_api_id, is_uuid
+import logging
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Mapping, MutableSequence
+from .time import SparkTime, to_epoch_ns
+from ..codec import iter_items
+from ..retry import endpoint
+from .base import root_of
+from ..utils import is_api_id, is_uuid, uuid_to_api_id
+from ..exceptions.spark_exceptions import SparkAPIException
+
+log = logging.getLogger('sparkpy.container')
+
+# Bytes read from the socket at a time when streaming a page
+PAGE_CHUNK = 65536
+
+# Fields converted to datetime64 by the columnar adapters
+TIME_FIELDS = frozenset(('created', 'lastActivity'))
+# Marks a missing timestamp from `to_epoch_ns`, NaT as a datetime64
+NAT = -2 ** 63
+
+
+def paginate(session, url, params=None, start=None):
+    '''
+    Follow a paginated Cisco Spark listing one page at a time
+
+    Only the current page is held in memory, nothing is accumulated between
+    pages.
+
+    :param session: The :class:`SparkSession <SparkSession>` to query with
+    :param url: The listing url, ie: `SparkMessage.API_BASE`
+    :param params: (optional) URL paramaters for the first page
+    :type params: dict
+    :param start: (optional) A `Link` url to resume from instead of `url`
+    :type start: str
+    :yields: a tuple of the raw `items` of the page and the url of the next
+             page, or `None` on the last page
+    '''
+    if start:
+        resp = session.get(start)
+    else:
+        resp = session.get(url, params=params)
+    while True:
+        if resp.status_code != 200:
+            raise SparkAPIException(resp)
+        next_page = resp.links.get('next', {}).get('url')
+        yield resp.json()['items'], next_page
+        if not next_page:
+            return
+        resp = session.get(next_page)
 
 
 class SparkContainer(MutableSequence):
@@ -60,27 +108,55 @@ class SparkContainer(MutableSequence):
     :param params: Any additional params to use on the generator
     :type params: dict
     :param parent: The parent of the container
-
-    Attributes:
-        _length_map (dict): Mapping to keep length hints across containers
-
-    .. note:: Calling len or providing negative indicies
-              will result in the generator being depleated.
-              This could lead to excessive API calls.
+    :param per_page: (optional) Items requested per page. Default: 50
+    :type per_page: int
+    :param limit: (optional) The most items to list. Default: `None`, all
+    :type limit: int
+
+    A container is a query, nothing is fetched until it's iterated, indexed
+    or measured. :meth:`where`, :meth:`order_by` and :meth:`limit` return a
+    refined query, compiled into the params of the listing request.
+
+    Pages are only fetched as far as an index or slice requires, following
+    the `Link` url of the previous page. Each page is fetched once, its
+    offset and url are kept so repeated access is served from memory.
+
+    The page boundaries and total count of every query are shared through
+    the session's `container_metadata` cache, when `container_ttl` is set.
+    Boundaries found to be stale are corrected as pages load. A new
+    container over the same query answers `len()` without any requests once
+    a previous one was fully loaded, and jumps straight to the page holding
+    an index. If the session has a `query_cache` the pages themselves are
+    shared too, so hot listings like `room.members` are served from memory
+    until a write to the resource drops them.
+
+    .. note:: Calling len, providing negative indicies or slices without an
+              end, or reversing the container requires every page to be
+              loaded unless the count is cached. The API has no descending
+              sort order to page from the end. This could lead to excessive
+              API calls.
     '''
 
-    _length_map = {}
-
-    def __init__(self, cls, params={}, parent=None, per_page=50):
+    def __init__(self, cls, params=None, parent=None, per_page=50,
+                 limit=None):
         self._cls = cls
-        self._params = params
-        self.params['max'] = per_page
+        self._params = dict(params or {})
+        # A limit within a page is a single request
+        self._params['max'] = per_page if limit is None \
+            else max(min(per_page, limit), 1)
+        self._per_page = per_page
+        self._limit = limit
         self._parent = parent
-        self._items = list()
-        self._next_page = None
-        self._load_items()
-        self._loaded = False
+        self._root = root_of(parent)
+        # Loaded pages by number. The offset of each known page's first
+        # item and the url it's fetched from, `None` for the first page
+        self._pages = dict()
+        self._offsets = [0]
+        self._cursors = [None]
+        self._total = None
         self._loaded_at = None
+        self._indexes = dict()
+        self._seed()
 
     @property
     def cls(self):
@@ -108,50 +184,346 @@ class SparkContainer(MutableSequence):
         '''
         return self._parent
 
+    @property
+    def root(self):
+        ''' The client at the root of the parent chain, passed to items '''
+        return self._root
+
+    @property
+    def session(self):
+        return self._root.session
+
     @property
     def per_page(self):
         return self._per_page
 
     @property
     def next_page(self):
-        return self._next_page
+        ''' The url of the first known page which isn't loaded '''
+        for page, cursor in enumerate(self._cursors):
+            if page not in self._pages:
+                return cursor
+        return None
+
+    @property
+    def loaded(self):
+        ''' `True` once every page has been loaded '''
+        return self._total is not None and \
+            len(self._pages) == len(self._offsets)
+
+    @property
+    def loaded_at(self):
+        ''' When the last page was found, as a `SparkTime` '''
+        return self._loaded_at
+
+    @property
+    def pages(self):
+        '''
+        The known page boundaries
+
+        :return: A `(offset, url)` tuple for each page, the url is `None`
+                 for the first page
+        :rtype: list
+        '''
+        return list(zip(self._offsets, self._cursors))
+
+    @property
+    def key(self):
+        ''' The query this container lists, `(endpoint, params)` '''
+        return (endpoint(self._cls.API_BASE),
+                tuple(sorted((k, str(v)) for k, v in self._params.items())))
+
+    # | Query building |----------------------------------------------------|
+    def where(self, **params):
+        '''
+        The listing filtered by API params, params set to `None` are left
+        out
+
+        :return: A new container, nothing is fetched
+        :rtype: `SparkContainer`
+
+        Usage:
+            >>> group_rooms = spark.rooms.where(type='group', teamId=team.id)
+        '''
+        merged = dict(self._params)
+        merged.update(params)
+        return self._derive({k: v for k, v in merged.items()
+                             if v is not None}, self._limit)
+
+    def order_by(self, field):
+        '''
+        The listing sorted by `field` using the API's `sortBy` param, ie:
+        `id`, `lastactivity` or `created` for rooms
+
+        :return: A new container, nothing is fetched
+        :rtype: `SparkContainer`
+        '''
+        return self._derive(dict(self._params, sortBy=field), self._limit)
+
+    def limit(self, count):
+        '''
+        The first `count` items of the listing. A limit within a page is
+        fetched with a single request.
+
+        :return: A new container, nothing is fetched
+        :rtype: `SparkContainer`
+
+        Usage:
+            >>> latest = room.messages.limit(5)
+        '''
+        if self._limit is not None:
+            count = min(count, self._limit)
+        return self._derive(self._params, count)
+
+    def _derive(self, params, limit):
+        return type(self)(self._cls, params=params, parent=self._parent,
+                          per_page=self._per_page, limit=limit)
 
     def more(self, *args):
-        self._load_items()
+        ''' Load the next page '''
+        self._load_next()
         return
 
-    def _load_items(self):
-        if self._next_page:
-            resp = self.parent.session.get(self._next_page)
+    def index_by(self, key):
+        '''
+        A hash index of the items by the value of their attribute `key`.
+        Loaded pages are indexed at once and later pages as they load, so
+        repeated lookups on a container don't rescan it.
+
+        :param key: The attribute to index, ie: `personEmail`
+        :type key: str
+        :rtype: :class:`SparkIndex`
+
+        Usage:
+            >>> members = room.members
+            >>> by_email = members.index_by('personEmail')
+            >>> 'someone@example.com' in by_email
+            >>> by_email['someone@example.com'].isModerator
+        '''
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = SparkIndex(self, key)
+            for page in sorted(self._pages):
+                index._add(self._page_items(page))
+        return index
+
+    def _discard(self, item):
+        ''' Drop an item which was deleted from the indexes '''
+        for index in self._indexes.values():
+            index._discard(item)
+        return
+
+    # | Page loading |------------------------------------------------------|
+    def _load_next(self):
+        '''
+        Load the first page not loaded yet
+
+        :return: `False` if every page within the limit is loaded
+        :rtype: bool
+        '''
+        for page, offset in enumerate(self._offsets):
+            if self._limit is not None and offset >= self._limit:
+                break
+            if page not in self._pages:
+                self._load_page(page)
+                return True
+        return False
+
+    def _raw_pages(self):
+        ''' The decoded items of each page within the limit, in order '''
+        cursor = None
+        offset = 0
+        while True:
+            data, cursor = self._fetch_page(cursor)
+            if self._limit is not None:
+                data = data[:max(self._limit - offset, 0)]
+                if offset + len(data) >= self._limit:
+                    cursor = None
+            yield data
+            offset += len(data)
+            if not cursor:
+                return
+
+    def _page_items(self, page):
+        ''' A loaded page's items within the limit '''
+        items = self._pages[page]
+        if self._limit is not None:
+            items = items[:max(self._limit - self._offsets[page], 0)]
+        return items
+
+    @property
+    def _metadata(self):
+        return getattr(self.session, 'container_metadata', None)
+
+    def _fetch_page(self, cursor, cache=True):
+        '''
+        The decoded items of a page and the url of the next page, served
+        from the session's `query_cache` when it holds them
+
+        :param cache: (optional) Use the `query_cache`. Default: True
+        :type cache: bool
+        '''
+        cache = getattr(self.session, 'query_cache', None) if cache else None
+        key = self.key + (cursor,)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        if cursor:
+            resp = self.session.get(cursor, stream=True)
         else:
-            resp = self.parent.session.get(self._cls.API_BASE,
-                                           params=self.params)
-        next_page = resp.links.get('next', {}).get('url')
+            resp = self.session.get(self._cls.API_BASE,
+                                    params=self.params,
+                                    stream=True)
+        try:
+            if resp.status_code != 200:
+                raise SparkAPIException(resp)
+            next_page = resp.links.get('next', {}).get('url')
+            # Items are decoded as the page streams in
+            data = list(iter_items(resp.iter_content(PAGE_CHUNK)))
+        finally:
+            resp.close()
+        if cache is not None:
+            cache.set(key, (data, next_page))
+        return data, next_page
+
+    def _seed(self):
+        ''' Start from the boundaries of the same query, if cached '''
+        cache = self._metadata
+        meta = cache.get(self.key) if cache is not None else None
+        if meta:
+            self._offsets = list(meta['offsets'])
+            self._cursors = list(meta['cursors'])
+            self._total = meta['total']
+            self._loaded_at = meta['loaded_at']
+        return
+
+    def _publish(self):
+        cache = self._metadata
+        if cache is not None:
+            cache.set(self.key, {'offsets': tuple(self._offsets),
+                                 'cursors': tuple(self._cursors),
+                                 'total': self._total,
+                                 'loaded_at': self._loaded_at})
+        return
+
+    def _load_page(self, page, cache=True):
+        data, next_page = self._fetch_page(self._cursors[page], cache)
+        parent, root = self._parent, self._root
+        items = [self.cls(parent=parent, root=root, **item) for item in data]
+        self._pages[page] = items
+        end = self._offsets[page] + len(items)
+        known = page + 1 < len(self._offsets)
+        if known and (not next_page or self._offsets[page + 1] != end):
+            # The listing changed since the boundaries were cached
+            del self._offsets[page + 1:], self._cursors[page + 1:]
+            for stale in [p for p in self._pages if p > page]:
+                del self._pages[stale]
+            self._total = None
+            known = False
+            for index in self._indexes.values():
+                index._clear()
+                for loaded in sorted(self._pages):
+                    if loaded != page:
+                        index._add(self._page_items(loaded))
         if next_page:
-            self._next_page = next_page
+            if known:
+                self._cursors[page + 1] = next_page
+            else:
+                self._offsets.append(end)
+                self._cursors.append(next_page)
         else:
-            self._loaded = True
+            self._total = end
             self._loaded_at = SparkTime()
-        self._items.extend([self.cls(parent=self.parent, **item)
-                            for item in resp.json()['items']])
+        for index in self._indexes.values():
+            index._add(self._page_items(page))
+        self._publish()
+        return items
+
+    def _locate(self, idx, cache=True):
+        '''
+        The page holding item `idx`, loading pages as needed. `cache` is
+        passed on to :meth:`_fetch_page`
+
+        :return: The page's items and the position of `idx` in them, or
+                 `None` if `idx` is past the end
+        '''
+        if self._limit is not None and idx >= self._limit:
+            return None
+        while True:
+            page = bisect_right(self._offsets, idx) - 1
+            items = self._pages.get(page)
+            if items is None:
+                items = self._load_page(page, cache)
+            pos = idx - self._offsets[page]
+            if pos < len(items):
+                return items, pos
+            if self._total is not None and page + 1 == len(self._offsets):
+                return None
+
+    def _load_all(self):
+        page = 0
+        while page < len(self._offsets):
+            if page not in self._pages:
+                self._load_page(page)
+            page += 1
         return
 
+    def _count(self):
+        ''' The total, loading every page if it isn't known '''
+        if self._limit is not None:
+            if self._limit <= 0:
+                return 0
+            if self._locate(self._limit - 1) is not None:
+                return self._limit
+        if self._total is None:
+            self._load_all()
+        return self._total
+
+    def _locate_end(self, idx):
+        '''
+        Locate a negative index. A cached total may be stale, loading the
+        page corrects it, so the index is located again from the new total
+        '''
+        while True:
+            total = self._count()
+            located = self._locate(idx + total) if idx + total >= 0 else None
+            if self._count() == total:
+                return located
+
+    # | Sequence interface |------------------------------------------------|
     def __getitem__(self, idx):
         if isinstance(idx, int):
-            while idx > len(self._items) and not self._loaded:
-                self._load_items()
-            if idx > len(self._items):
-                raise IndexError('List index must be <= {0}. ({1} > {0})'.
-                                 format(str(len(self._items) - 1), idx)
-                                 )
-            return self._items[idx]
+            located = self._locate(idx) if idx >= 0 else self._locate_end(idx)
+            if located is None:
+                raise IndexError(f'{self} index {idx} out of range')
+            items, pos = located
+            return items[pos]
+
+        elif isinstance(idx, slice):
+            start, stop, step = idx.start, idx.stop, idx.step
+            if (self._total is not None or stop is None or stop < 0 or
+                    (start is not None and start < 0) or
+                    (step is not None and step < 0)):
+                indices = range(*idx.indices(self._count()))
+            else:
+                indices = range(start or 0, stop, step or 1)
+            result = []
+            for i in indices:
+                located = self._locate(i)
+                if located is None:
+                    break
+                items, pos = located
+                result.append(items[pos])
+            return result
 
         # Dict Style lookups
         elif isinstance(idx, str):
+            key = idx
             if is_uuid(key):
-                key = uuid_to_api_id(key, self.cls.path)
+                key = uuid_to_api_id(key, endpoint(self.cls.API_BASE))
             if is_api_id(key):
-                return self.cls(key, parent=self.parent)
+                return self.cls(key, parent=self.parent, root=self._root)
             else:
                 raise TypeError('Key must be a uuid or Spark API ID')
         # Fail!
@@ -159,19 +531,80 @@ class SparkContainer(MutableSequence):
             raise ValueError(f'{self} requires an int or {self.cls}.id')
 
     def __iter__(self):
-        pos = 0
+        idx = 0
         while True:
-            if self._loaded and pos == len(self._items) - 1:
+            located = self._locate(idx)
+            if located is None:
                 return
-            if pos <= len(self._items) - 1:
-                yield self._items[pos]
-                pos += 1
-            if not self._loaded:
-                self.more()
+            items, pos = located
+            stop = len(items)
+            if self._limit is not None:
+                stop = min(stop, pos + self._limit - idx)
+            yield from items[pos:stop]
+            idx += stop - pos
+
+    def forward(self, window=1):
+        '''
+        Iterate the items, releasing each page once iteration is `window`
+        pages past it, so memory is bounded by the window rather than the
+        size of the listing. Released pages are fetched again if accessed
+        later.
+
+        :param window: (optional) Pages kept loaded, including the page
+                       being iterated. Default: 1
+        :type window: int
+        :yields: Each item in order
+
+        Usage:
+            >>> for message in room.messages.forward():
+            ...     archive(message)
+
+        .. note:: Items are also kept alive by indexes from
+                  :meth:`index_by` and by references the caller holds
+        '''
+        window = max(window, 1)
+        idx = 0
+        while True:
+            # Pages bypass the query cache, which would keep them all
+            located = self._locate(idx, cache=False)
+            if located is None:
+                return
+            items, pos = located
+            page = bisect_right(self._offsets, idx) - 1
+            for stale in [p for p in self._pages if p <= page - window]:
+                del self._pages[stale]
+            stop = len(items)
+            if self._limit is not None:
+                stop = min(stop, pos + self._limit - idx)
+            yield from items[pos:stop]
+            idx += stop - pos
+            del items, located
+
+    def __reversed__(self):
+        idx = self._count()
+        while idx > 0:
+            idx -= 1
+            located = self._locate(idx)
+            if located is None:
+                # The cached total was stale, carry on from the new end
+                idx = min(idx, self._count())
                 continue
+            items, pos = located
+            yield items[pos]
 
     def __len__(self):
-        return len(self._items)
+        return self._count()
+
+    def __length_hint__(self):
+        if self._total is not None:
+            hint = self._total
+        else:
+            last = len(self._offsets) - 1
+            hint = self._offsets[last] + len(self._pages.get(last, ()))
+        return hint if self._limit is None else min(hint, self._limit)
+
+    def __bool__(self):
+        return self._locate(0) is not None
 
     def __setitem__(self, key, value):
         raise NotImplementedError
@@ -203,11 +636,9 @@ class SparkContainer(MutableSequence):
 
         '''
         items = []
-        if re_flags:
-            pattern = re.compile(regexp, re_flags)
-        pattern = re.compile(regexp)
+        pattern = re.compile(regexp, re_flags or 0)
 
-        for item in self.__make_iter():
+        for item in self:
             if hasattr(item, key) and pattern.search(getattr(item, key)):
                 items.append(item)
         return items
@@ -230,9 +661,240 @@ class SparkContainer(MutableSequence):
                 items.append(item)
         return items
 
+    # | Columnar export |---------------------------------------------------|
+    def to_columns(self, fields=None):
+        '''
+        The listing as columns of raw API values, built from the decoded
+        pages without creating any models
+
+        :param fields: (optional) The fields to include. Default: every
+                       field in the item class's `PROPERTIES`
+        :type fields: list
+        :return: A list of values per field, `None` where an item doesn't
+                 have the field
+        :rtype: dict
+
+        Usage:
+            >>> columns = room.messages.to_columns(['personEmail', 'created'])
+            >>> Counter(columns['personEmail']).most_common(5)
+        '''
+        columns = {field: [] for field in (fields or self.cls.PROPERTIES)}
+        for data in self._raw_pages():
+            for field, column in columns.items():
+                column.extend([item.get(field) for item in data])
+        return columns
+
+    def to_numpy(self, fields=None):
+        '''
+        The listing as numpy arrays. `created` and `lastActivity` are
+        `datetime64[ns]` in UTC, other fields are `object` arrays.
+
+        :param fields: (optional) See :meth:`to_columns`
+        :rtype: dict
+        :raises ImportError: If numpy isn't installed
+        '''
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('to_numpy requires numpy')
+        arrays = {}
+        for field, column in self.to_columns(fields).items():
+            if field in TIME_FIELDS:
+                arrays[field] = numpy.asarray(to_epoch_ns(column),
+                                              dtype='int64') \
+                    .view('datetime64[ns]')
+            else:
+                # Assigned rather than converted, so list values such as
+                # `files` stay one element each
+                arrays[field] = numpy.empty(len(column), dtype=object)
+                arrays[field][:] = column
+        return arrays
+
+    def to_pandas(self, fields=None):
+        '''
+        The listing as a `pandas.DataFrame`, timestamps as `datetime64[ns]`
+
+        :param fields: (optional) See :meth:`to_columns`
+        :raises ImportError: If pandas isn't installed
+        '''
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError('to_pandas requires pandas')
+        arrays = self.to_numpy(fields)
+        return pandas.DataFrame(arrays, columns=list(arrays))
+
+    def to_arrow(self, fields=None):
+        '''
+        The listing as a `pyarrow.Table`, timestamps as `timestamp[ns, UTC]`
+
+        :param fields: (optional) See :meth:`to_columns`
+        :raises ImportError: If pyarrow isn't installed
+        '''
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('to_arrow requires pyarrow')
+        arrays = {}
+        for field, column in self.to_columns(fields).items():
+            if field in TIME_FIELDS:
+                arrays[field] = pyarrow.array(
+                    [None if ns == NAT else ns for ns in to_epoch_ns(column)],
+                    type=pyarrow.timestamp('ns', tz='UTC'))
+            else:
+                arrays[field] = pyarrow.array(column)
+        return pyarrow.table(arrays)
+
+    def flat_map(self, attr, concurrency=16, ordered=False):
+        '''
+        Iterate a container of every item, ie: the members of every room,
+        listing up to `concurrency` of them at once
+
+        While the session is backing off from a `429` no further listings
+        are started. A listing which fails doesn't stop the others, its
+        exception is yielded in place of its items.
+
+        :param attr: The item attribute holding a container, ie: `members`
+        :type attr: str
+        :param concurrency: (optional) Listings in flight at once.
+                            Default: 16
+        :type concurrency: int
+        :param ordered: (optional) Yield in the order of the items rather
+                        than as each listing completes. Default: `False`
+        :type ordered: bool
+        :yields: `(item, child)` tuples, or `(item, exception)` for an item
+                 whose listing failed
+
+        Usage:
+            >>> for room, member in spark.rooms.flat_map('members'):
+            ...     if isinstance(member, Exception):
+            ...         continue
+
+        .. note:: Create the client with `thread_safe=True` so every worker
+                  thread sends through its own underlying session.
+        '''
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, \
+            wait
+
+        def children(item):
+            return list(getattr(item, attr))
+
+        backoff = getattr(self.session, 'backoff', None)
+        items = iter(self)
+        running = deque()
+        exhausted = False
+        with ThreadPoolExecutor(concurrency,
+                                thread_name_prefix='sparkpy') as pool:
+            try:
+                while True:
+                    while not exhausted and len(running) < concurrency:
+                        if backoff is not None:
+                            backoff.wait()
+                        item = next(items, None)
+                        if item is None:
+                            exhausted = True
+                        else:
+                            running.append((item, pool.submit(children,
+                                                              item)))
+                    if not running:
+                        return
+                    if ordered:
+                        item, future = running.popleft()
+                    else:
+                        done = wait([future for _, future in running],
+                                    return_when=FIRST_COMPLETED).done
+                        index = next(i for i, (_, future)
+                                     in enumerate(running) if future in done)
+                        item, future = running[index]
+                        del running[index]
+                    error = future.exception()
+                    if error is not None:
+                        log.warning('Listing %s of %s failed: %s',
+                                    attr, item, error)
+                        yield item, error
+                    else:
+                        for child in future.result():
+                            yield item, child
+            finally:
+                # The caller stopped early
+                for _, future in running:
+                    future.cancel()
+
     def __repr__(self):
         return f'SparkContainer({self.cls})'
 
     def __str__(self):
-        return str(self._items)
+        return str([item for page in sorted(self._pages)
+                    for item in self._pages[page]])
 
+
+class SparkIndex(Mapping):
+    '''
+    Items of a :class:`SparkContainer` by the value of one attribute,
+    created by :meth:`SparkContainer.index_by`
+
+    A lookup of a value not seen yet loads the container's remaining pages
+    one at a time until it's found. Lookups of values already seen don't
+    make any requests. `len()` and iteration load every page.
+    '''
+
+    def __init__(self, container, key):
+        self._container = container
+        self._key = key
+        self._items = dict()
+
+    @property
+    def key(self):
+        ''' The indexed attribute '''
+        return self._key
+
+    def get_all(self, value):
+        '''
+        Every item whose attribute equals `value`
+
+        :rtype: list
+        '''
+        self._load_all()
+        return list(self._items.get(value, ()))
+
+    def _add(self, items):
+        key = self._key
+        for item in items:
+            self._items.setdefault(getattr(item, key, None), []).append(item)
+        return
+
+    def _discard(self, item):
+        value = getattr(item, self._key, None)
+        items = self._items.get(value, [])
+        if item in items:
+            items.remove(item)
+        if not items:
+            self._items.pop(value, None)
+        return
+
+    def _clear(self):
+        self._items.clear()
+        return
+
+    def _load_all(self):
+        while self._container._load_next():
+            pass
+        return
+
+    def __getitem__(self, value):
+        ''' The first item whose attribute equals `value` '''
+        while value not in self._items:
+            if not self._container._load_next():
+                raise KeyError(value)
+        return self._items[value][0]
+
+    def __iter__(self):
+        self._load_all()
+        return iter(list(self._items))
+
+    def __len__(self):
+        self._load_all()
+        return len(self._items)
+
+    def __repr__(self):
+        return f'SparkIndex({self._container.cls}, {self._key})'
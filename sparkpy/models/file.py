@@ -55,10 +55,13 @@ class SparkFile(object):
                      the users download directory.
         '''
         resp = self.parent.session.get(self.url, stream=True)
-        with open(path + self.filename, 'wb') as f:
-            for chunk in resp.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
+        try:
+            with open(path + self.filename, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size=1024):
+                    if chunk:
+                        f.write(chunk)
+        finally:
+            resp.close()
         return
 
     def __repr__(self):
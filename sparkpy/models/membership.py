@@ -2,6 +2,7 @@
 
 from .base import SparkBase, SparkProperty
 from .time import SparkTime
+from ..exceptions.spark_exceptions import SparkAPIException
 
 
 class SparkMembership(SparkBase):
@@ -27,9 +28,13 @@ class SparkMembership(SparkBase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, path='memberships', **kwargs)
 
-    def update(self, key, value):
-        if key == 'isModerator':
-            self.parent.session.put(self.url, json={key: value})
+    def update(self, **data):
+        if 'isModerator' in data:
+            resp = self.session.put(self.url,
+                                    json={'isModerator': data['isModerator']})
+            if resp.status_code != 200:
+                raise SparkAPIException(resp)
+            self._load_data(resp.json())
         return
 
 
@@ -55,9 +60,13 @@ class SparkTeamMembership(SparkBase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, path='team/memberships', **kwargs)
 
-    def update(self, key, value):
-        if key == 'isModerator':
-            self.parent.session.put(self.url, json={key: value})
+    def update(self, **data):
+        if 'isModerator' in data:
+            resp = self.session.put(self.url,
+                                    json={'isModerator': data['isModerator']})
+            if resp.status_code != 200:
+                raise SparkAPIException(resp)
+            self._load_data(resp.json())
         return
 
     def __repr__(self):
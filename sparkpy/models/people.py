@@ -2,6 +2,7 @@ import logging
 from .base import SparkBase, SparkProperty
 from .time import SparkTime
 from .organization import SparkOrganization
+from ..exceptions.spark_exceptions import SparkAPIException
 
 log = logging.getLogger('sparkpy.people')
 
@@ -43,6 +44,9 @@ class SparkPerson(SparkBase):
                                                  optional=True),
                   'loginEnabled': SparkProperty('loginEnabled',
                                                 optional=True)}
+    # Properties sent in full on every update
+    UPDATE_PROPERTIES = ('emails', 'displayName', 'firstName', 'lastName',
+                         'nickName', 'avatar', 'orgId', 'roles', 'licenses')
 
     def __init__(self, *args, **kwargs):
         self._org = ''
@@ -63,20 +67,23 @@ class SparkPerson(SparkBase):
             log.debug('set org')
         return self._org
 
-    def update(self,
-               emails=None,
-               displayName=None,
-               firstName=None,
-               lastName=None,
-               avatar=None,
-               orgId=None,
-               roles=None,
-               licenses=None):
-
-        updates = {k: v for k, v in locals().items() if k != 'self' and v}
-        existing_data = self.parent.session.get(self.url).json()
-        existing_data.update(updates)
-        self.parent.session.put(self.url, json=existing_data)
+    def update(self, **data):
+        '''
+        The API replaces the whole person on update, so any properties not
+        being changed are filled in from the already loaded state. The
+        person is only fetched first if it hasn't been loaded.
+        '''
+        if not self.loaded:
+            self._fetch_data()
+        payload = {}
+        for key in self.UPDATE_PROPERTIES:
+            value = data[key] if key in data else getattr(self, key)
+            if value is not None:
+                payload[key] = value
+        resp = self.session.put(self.url, json=payload)
+        if resp.status_code != 200:
+            raise SparkAPIException(resp)
+        self._load_data(resp.json())
         return
 
     def __repr__(self):
@@ -3,6 +3,7 @@ from .time import SparkTime
 from .message import SparkMessage
 from .membership import SparkMembership
 from .container import SparkContainer
+from ..exceptions.spark_exceptions import SparkAPIException
 
 
 class SparkRoom(SparkBase):
@@ -25,11 +26,15 @@ class SparkRoom(SparkBase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, path='rooms', **kwargs)
 
-    def update(self, key, value):
-        if key == 'title' and len(value):
-            self.parent.session.put(self.url, json={key: value})
-        elif key == 'isLocked':
-            raise NotImplemented('isLocked is not implemnted')
+    def update(self, **data):
+        if 'isLocked' in data:
+            raise NotImplementedError('isLocked is not implemnted')
+        if not data.get('title'):
+            raise ValueError('title must not be empty')
+        resp = self.session.put(self.url, json={'title': data['title']})
+        if resp.status_code != 200:
+            raise SparkAPIException(resp)
+        self._load_data(resp.json())
         return
 
     @property
@@ -69,7 +74,7 @@ class SparkRoom(SparkBase):
             :type: dict
         '''
         data = {'roomId': self.id}
-        if self.parent.is_bot and self.type == 'group':
+        if self.root.is_bot and self.type == 'group':
             data['mentionedPeople'] = 'me'
         return data
 
@@ -81,7 +86,7 @@ class SparkRoom(SparkBase):
 
             :return: None
         '''
-        self.parent.send_message(text, room_id=self.id, file=file)
+        self.root.send_message(text, room_id=self.id, file=file)
         return
 
     def add_member(self, *args, email='', moderator=False):
@@ -102,7 +107,7 @@ class SparkRoom(SparkBase):
             data['personEmail'] = email
         if moderator:
             data['isModerator'] = moderator
-        self.parent.session.post(SparkMembership.API_BASE, json=data)
+        self.root.session.post(SparkMembership.API_BASE, json=data)
         return
 
     def remove_member(self, *args, email=''):
@@ -116,14 +121,15 @@ class SparkRoom(SparkBase):
             :return: None
         '''
 
+        # The API filters the room's memberships by person
         if args:
-            for member in self.members.filtered(lambda
-                                                x: x.personId == args[0]):
-                member.delete()
+            members = self.members.where(personId=args[0])
         elif '@' in email:
-            for member in self.members.filtered(lambda
-                                                x: x.personEmail == email):
-                member.delete()
+            members = self.members.where(personEmail=email)
+        else:
+            members = []
+        for member in list(members):
+            member.delete()
         return
 
     def remove_all_members(self):
@@ -131,7 +137,7 @@ class SparkRoom(SparkBase):
 
             :return: None
         '''
-        for member in self.members.filtered(lambda x: x != self.parent.me.id):
+        for member in self.members.filtered(lambda x: x != self.root.me.id):
             member.delete()
         return
 
@@ -5,6 +5,7 @@ from .time import SparkTime
 from .membership import SparkTeamMembership
 from .container import SparkContainer
 from .room import SparkRoom
+from ..exceptions.spark_exceptions import SparkAPIException
 
 
 class SparkTeam(SparkBase):
@@ -36,24 +37,26 @@ class SparkTeam(SparkBase):
         '''
         return SparkContainer(SparkTeamMembership,
                               params={'teamId': self.id},
-                              parent=self,
-                              session=self.session)
+                              parent=self)
 
     @property
     def subrooms(self):
         '''SparkContainer:`SparkRoom` Generator of members of the team. '''
         return SparkContainer(SparkRoom,
-                              params={'teamId': self.id,'sortBy': 'id'},
-                              parent=self,
-                              session=self.session)
-
-    def update(self, key, value):
-        if key == 'name' and len(value):
-            self.parent.session.put(self.url, json={key: value})
+                              params={'teamId': self.id, 'sortBy': 'id'},
+                              parent=self)
+
+    def update(self, **data):
+        if not data.get('name'):
+            raise ValueError('name must not be empty')
+        resp = self.session.put(self.url, json={'name': data['name']})
+        if resp.status_code != 200:
+            raise SparkAPIException(resp)
+        self._load_data(resp.json())
         return
 
     def create_subroom(self, title):
-        self.parent.session.create_room(title, team_id=self.id)
+        self.root.create_room(title, team_id=self.id)
         return
 
     def add_member(self, _id, email='', moderator=False):
@@ -75,10 +78,10 @@ class SparkTeam(SparkBase):
         if moderator:
             data['isModerator'] = moderator
 
-        self.parent.session.post('team/memberships', json=data)
+        self.root.session.post(SparkTeamMembership.API_BASE, json=data)
         return
 
-    def remove_member(self, _id, email=''):
+    def remove_member(self, _id=None, email=''):
         ''' Add a person to the team
 
             :param email: email address of person to add
@@ -89,16 +92,35 @@ class SparkTeam(SparkBase):
             :return: None
         '''
 
-        if args:
-            for member in self.members.filtered(lambda
-                                                x: x.personId == _id):
-                member.delete()
+        # Team memberships can't be filtered by person, so they're looked
+        # up in an index of the listing kept between calls
+        if _id:
+            key, value = 'personId', _id
         elif '@' in email:
-            for member in self.members.filtered(lambda
-                                                x: x.personEmail == email):
-                member.delete()
+            key, value = 'personEmail', email
+        else:
+            return
+        members = self._members_by(key).get_all(value)
+        if not members:
+            # They may have joined since the listing was loaded
+            self._indexed_members = None
+            members = self._members_by(key).get_all(value)
+        for member in members:
+            member.delete()
+            self._indexed_members._discard(member)
         return
 
+    def _members_by(self, key):
+        ''' The team's members indexed by `key`, see :meth:`remove_member` '''
+        members = self.__dict__.get('_indexed_members')
+        if members is None:
+            members = self._indexed_members = self.members
+            # Both lookups are indexed up front, so a removed member is
+            # discarded from each
+            for name in ('personId', 'personEmail'):
+                members.index_by(name)
+        return members.index_by(key)
+
     def remove_all_members(self):
         ''' Remove all people from the room leaving this account
 
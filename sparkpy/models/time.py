@@ -1,48 +1,148 @@
-from datetime import datetime
+'''
+sparkpy.models.time
+~~~~~~~~~~~~~~~~~~~
+Timestamps as returned by the Cisco Spark API
+
+The API always returns UTC timestamps in a fixed ISO-8601 format, ie:
+`2017-08-26T12:01:36.373Z`. :class:`SparkTime` keeps that string and only
+parses it when the `datetime` is actually needed.
+'''
+
+from array import array
+from datetime import datetime, timedelta, timezone
+
+FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+EPOCH = datetime(1970, 1, 1)
+
+
+def _parse(ts):
+    ''' Parse an API timestamp into a naive UTC `datetime` '''
+    try:
+        # fromisoformat is implemented in C and far cheaper than strptime
+        dt = datetime.fromisoformat(ts[:-1] if ts.endswith('Z') else ts)
+    except ValueError:
+        return datetime.strptime(ts, FORMAT)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
 
 
 class SparkTime(object):
+    '''
+    A Cisco Spark timestamp
+
+    :param ts: (optional) A timestamp string from the API.
+               If omitted the current UTC time is used.
+    :type ts: str
+
+    Comparisons between two :class:`SparkTime` objects compare the raw
+    strings when possible, which sort the same as the parsed values.
+    '''
+
+    __slots__ = ('_ts', '_dt')
 
     def __init__(self, *args):
         if args:
             self._ts = args[0]
-            self._dt = datetime.strptime(self.ts, '%Y-%m-%dT%H:%M:%S.%fZ')
+            self._dt = None
         else:
-            self._dt = datetime.now()
-            self._ts = self.dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-            # Python datetime fun
-            if len(self.ts) == 27:
-                self._ts = self._ts[:23] + 'Z'
+            self._ts = None
+            self._dt = datetime.now(timezone.utc).replace(tzinfo=None)
         return
 
     @property
     def ts(self):
+        if self._ts is None:
+            # Python datetime fun, trim microseconds to milliseconds
+            self._ts = self._dt.strftime(FORMAT)[:23] + 'Z'
         return self._ts
 
     @property
     def dt(self):
+        if self._dt is None:
+            self._dt = _parse(self._ts)
         return self._dt
 
+    @property
+    def epoch_ns(self):
+        ''' Nanoseconds since the unix epoch '''
+        return (self.dt - EPOCH) // timedelta(microseconds=1) * 1000
+
+    def _pair(self, other):
+        if isinstance(other, SparkTime):
+            # Fixed width ISO-8601 strings sort chronologically
+            if self._ts is not None and other._ts is not None and \
+               len(self._ts) == len(other._ts):
+                return self._ts, other._ts
+            return self.dt, other.dt
+        return self.dt, other
+
     def __eq__(self, other):
-        return self.dt == other
+        a, b = self._pair(other)
+        return a == b
 
     def __ne__(self, other):
-        return self.dt != other
+        a, b = self._pair(other)
+        return a != b
 
     def __lt__(self, other):
-        return self.dt < other
+        a, b = self._pair(other)
+        return a < b
 
     def __le__(self, other):
-        return self.dt <= other
+        a, b = self._pair(other)
+        return a <= b
 
     def __gt__(self, other):
-        return self.dt > other
+        a, b = self._pair(other)
+        return a > b
 
     def __ge__(self, other):
-        return self.dt >= other
+        a, b = self._pair(other)
+        return a >= b
 
     def __hash__(self):
-        return hash(self.ts)
+        # Equal timestamps may be written differently, ie: `Z` or `+00:00`
+        return hash(self.dt)
 
     def __repr__(self):
         return self.ts
+
+
+def to_epoch_ns(timestamps):
+    '''
+    Convert a batch of timestamps to nanoseconds since the unix epoch
+
+    When numpy is installed the strings are parsed in a single vectorized
+    call, otherwise each timestamp is parsed with `datetime.fromisoformat`.
+
+    :param timestamps: An iterable of API timestamp strings,
+                       :class:`SparkTime` or naive UTC `datetime` objects.
+                       `None` values are converted to the minimum int64
+    :return: A `numpy.ndarray` of `int64` if numpy is installed,
+             otherwise an `array.array` of signed 64 bit ints
+
+    Usage:
+        >>> ns = to_epoch_ns(message['created'] for message in messages)
+        >>> order = numpy.argsort(ns)
+    '''
+    # Imported here, every model imports this module
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    values = [ts.ts if isinstance(ts, SparkTime) else ts
+              for ts in timestamps]
+    if numpy is not None:
+        strings = [ts.rstrip('Z') if isinstance(ts, str) else ts
+                   for ts in values]
+        return numpy.array(strings, dtype='datetime64[ns]').astype('int64')
+    result = array('q')
+    for ts in values:
+        if ts is None:
+            result.append(-2 ** 63)
+            continue
+        if isinstance(ts, str):
+            ts = _parse(ts)
+        result.append((ts - EPOCH) // timedelta(microseconds=1) * 1000)
+    return result
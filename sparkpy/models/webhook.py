@@ -2,6 +2,7 @@
 
 from .base import SparkBase, SparkProperty
 from .time import SparkTime
+from ..exceptions.spark_exceptions import SparkAPIException
 
 
 class SparkWebhook(SparkBase):
@@ -48,9 +49,17 @@ class SparkWebhook(SparkBase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, path='webhooks', **kwargs)
 
-    def update(self, name, targetUrl):
-        data = {'name': name, 'targetUrl': targetUrl}
-        self.parent.session.put(self.API_BASE, json=data)
+    def update(self, **data):
+        # Both properties are required by the API. They're only read from
+        # the webhook when not given, as reading them may load it
+        payload = {
+            'name': data['name'] if 'name' in data else self.name,
+            'targetUrl': (data['targetUrl'] if 'targetUrl' in data
+                          else self.targetUrl)}
+        resp = self.session.put(self.url, json=payload)
+        if resp.status_code != 200:
+            raise SparkAPIException(resp)
+        self._load_data(resp.json())
         return
 
     def __repr__(self):
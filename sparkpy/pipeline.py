@@ -0,0 +1,196 @@
+'''
+sparkpy.pipeline
+~~~~~~~~~~~~~~~~
+Queue a batch of API calls and run them concurrently
+
+Calls made through a pipeline are queued and return a
+:class:`concurrent.futures.Future`. When the `with` block exits they are
+run on a bounded pool of threads sharing the client's session, so the
+session's retry policy and `429` backoff apply to the whole batch. Results
+are returned in submission order, a call which failed is represented by
+its exception.
+
+Usage:
+    >>> with spark.pipeline(max_workers=16) as pipeline:
+    ...     rooms = [pipeline.load(spark.rooms[room_id])
+    ...              for room_id in room_ids]
+    ...     added = [pipeline.wrap(room).add_member(email)
+    ...              for room in team_rooms]
+    ...     created = pipeline.spark.create_room('Launch')
+    >>> rooms[0].result().title
+    >>> errors = [result for result in pipeline.results
+    ...           if isinstance(result, Exception)]
+
+.. note:: Create the client with `thread_safe=True` so every worker thread
+          sends through its own underlying session.
+'''
+
+import inspect
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
+
+log = logging.getLogger('sparkpy.pipeline')
+
+
+class SparkPipeline(object):
+    '''
+    A batch of queued calls
+
+    :param spark: The :class:`Spark <Spark>` client
+    :param max_workers: (optional) Maximum calls in flight at once.
+                        Default: 8
+    :type max_workers: int
+
+    Attributes:
+        results (list): After the batch has run, the result or exception
+                        of every call in submission order
+    '''
+
+    def __init__(self, spark, max_workers=8):
+        self._spark = spark
+        self.max_workers = max_workers
+        self._calls = []
+        self.results = None
+
+    @property
+    def spark(self):
+        ''' The client, with its method calls queued on the pipeline '''
+        return self.wrap(self._spark)
+
+    def submit(self, fn, *args, **kwargs):
+        '''
+        Queue `fn(*args, **kwargs)`
+
+        :return: A future resolved when the batch runs
+        :rtype: :class:`concurrent.futures.Future`
+        '''
+        future = Future()
+        self._calls.append((future, fn, args, kwargs))
+        return future
+
+    def wrap(self, obj):
+        '''
+        A proxy for `obj` whose method calls and attribute reads are queued
+
+        :param obj: A :class:`Spark <Spark>` client or a model
+        :rtype: :class:`SparkPipelineProxy`
+        '''
+        return SparkPipelineProxy(self, obj)
+
+    def load(self, model):
+        '''
+        Queue fetching a model's properties
+
+        :param model: A lazy loaded model, ie: `spark.rooms[room_id]`
+        :return: A future resolving to the loaded model
+        '''
+        return self.submit(_load, model)
+
+    def get(self, url, **kwargs):
+        '''
+        Queue a `GET` through the client's session
+
+        :return: A future resolving to the response
+        '''
+        return self.submit(self._spark.session.get, url, **kwargs)
+
+    def execute(self):
+        '''
+        Run every queued call. Called when the `with` block exits.
+
+        :return: The result or exception of each call in submission order
+        :rtype: list
+        :raises: A `KeyboardInterrupt` or `SystemExit` raised by a call,
+                 once every call has finished
+        '''
+        calls, self._calls = self._calls, []
+        if calls:
+            # Build the session here rather than racing to in the workers
+            self._spark.session
+            workers = min(self.max_workers, len(calls))
+            with ThreadPoolExecutor(workers,
+                                    thread_name_prefix='sparkpy') as pool:
+                for call in calls:
+                    pool.submit(_run, *call)
+        self.results = [_outcome(future) for future, *_ in calls]
+        for result in self.results:
+            if isinstance(result, BaseException) and \
+                    not isinstance(result, Exception):
+                raise result
+        failed = sum(isinstance(result, Exception) for result in self.results)
+        if failed:
+            log.warning('%s of %s pipelined calls failed', failed, len(calls))
+        return self.results
+
+    def cancel(self):
+        ''' Cancel every queued call '''
+        calls, self._calls = self._calls, []
+        for future, *_ in calls:
+            future.cancel()
+        return
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.cancel()
+
+    def __repr__(self):
+        return f'SparkPipeline({len(self._calls)} queued)'
+
+
+class SparkPipelineProxy(object):
+    '''
+    Queues method calls and attribute reads on its target, returning
+    futures. Created by :meth:`SparkPipeline.wrap`.
+    '''
+
+    def __init__(self, pipeline, target):
+        self._pipeline = pipeline
+        self._target = target
+
+    def __getattr__(self, name):
+        target = self._target
+        if callable(inspect.getattr_static(target, name)):
+            def queued(*args, **kwargs):
+                return self._pipeline.submit(getattr(target, name),
+                                             *args, **kwargs)
+            return queued
+        # Properties may make requests, so read them in the batch too
+        return self._pipeline.submit(getattr, target, name)
+
+    def __repr__(self):
+        # The target's own repr may make a request
+        return f'SparkPipelineProxy({type(self._target).__name__})'
+
+
+def _load(model):
+    model.refresh(force=True)
+    return model
+
+
+def _run(future, fn, args, kwargs):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except BaseException as e:
+        # Resolve the future even on KeyboardInterrupt or SystemExit,
+        # execute() waits on every future
+        future.set_exception(e)
+        if not isinstance(e, Exception):
+            raise
+    return
+
+
+def _outcome(future):
+    if future.cancelled():
+        return CancelledError()
+    error = future.exception()
+    return future.result() if error is None else error
@@ -0,0 +1,358 @@
+'''
+sparkpy.pool
+~~~~~~~~~~~~
+Spread requests across several bearer tokens
+
+Cisco Spark rate limits each token separately. A :class:`SparkPool` is a
+:class:`Spark <Spark>` client backed by a session per token, each with its
+own rate limit state:
+
+* Reads are balanced across the tokens, preferring tokens which are not
+  backing off and have the fewest requests in flight.
+* Writes to a room are sent with a token whose owner is a member of the
+  room. Membership is discovered on first use and cached.
+* A token receiving a `429` is skipped while it backs off and the request
+  is sent again with another token. A token receiving a `401` is disabled.
+
+Usage:
+    >>> from sparkpy.pool import SparkPool
+    >>> spark = SparkPool({'admin': ADMIN_TOKEN, 'bot': BOT_TOKEN},
+    ...                   thread_safe=True)
+    >>> for room in spark.rooms:
+    ...     ...
+    >>> spark.session.utilization()
+    {'admin': {'requests': 812, 'in_flight': 0, 'rate_limited': 3, ...},
+     'bot': {'requests': 790, ...}}
+'''
+
+import copy
+import logging
+import threading
+
+from .cache import SparkTTLCache, SparkQueryCache
+from .retry import SparkRetryPolicy, endpoint
+from .session import SparkSession
+from .spark import Spark
+from .utils import decode_api_id, is_api_id, uuid_to_api_id
+
+log = logging.getLogger('sparkpy.pool')
+
+API = 'https://api.ciscospark.com/v1/'
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class SparkPoolMember(object):
+    '''
+    A token's session and its utilization counters
+
+    :param name: A label for the token used in logs and stats
+    :param session: The token's :class:`SparkSession <SparkSession>`
+    '''
+
+    def __init__(self, name, session):
+        self.name = name
+        self.session = session
+        self.disabled = False
+        self.requests = 0
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.unauthorized = 0
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        ''' `True` if the token is enabled and not backing off '''
+        return not self.disabled and not self.session.backoff.remaining
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            response = self.session.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if response.status_code == 429:
+            with self._lock:
+                self.rate_limited += 1
+        elif response.status_code == 401:
+            with self._lock:
+                self.unauthorized += 1
+            log.warning('Token %s is unauthorized, disabling it', self.name)
+            self.disabled = True
+        return response
+
+    def failover(self):
+        ''' Count a request sent again with another token '''
+        with self._lock:
+            self.failovers += 1
+        return
+
+    def stats(self):
+        transfer = self.session.transfer.totals()
+        return {'requests': self.requests,
+                'in_flight': self.in_flight,
+                'rate_limited': self.rate_limited,
+                'unauthorized': self.unauthorized,
+                'failovers': self.failovers,
+                'backoff': self.session.backoff.remaining,
+                'disabled': self.disabled,
+                'sent': transfer['sent'],
+                'received': transfer['received']}
+
+    def __repr__(self):
+        return f'SparkPoolMember({self.name})'
+
+
+class SparkPoolSession(object):
+    '''
+    Routes each request to one of several token bound sessions. Provides
+    the request methods of :class:`SparkSession <SparkSession>`.
+
+    :param tokens: Bearer tokens, a list or a mapping of name to token
+    :param membership_ttl: (optional) Seconds to cache which tokens are
+                           members of a room. Default: 600
+    :type membership_ttl: float
+    :param container_ttl: (optional) Seconds to remember listing page
+                          boundaries, see :class:`SparkSession
+                          <SparkSession>`. Default: 0, off
+    :type container_ttl: float
+    :param query_cache_ttl: (optional) Seconds to serve listings from
+                            memory, see :class:`SparkSession <SparkSession>`.
+                            Default: 0, off
+    :type query_cache_ttl: float or dict
+    :param \\**session_kwargs: (optional) Passed to each
+                              :class:`SparkSession <SparkSession>`
+    '''
+
+    def __init__(self, tokens, membership_ttl=600, container_ttl=0,
+                 query_cache_ttl=0, **session_kwargs):
+        tokens = _named(tokens)
+        # Rate limited requests are sent again with another token instead
+        # of waiting on the same one
+        retry = copy.copy(session_kwargs.pop('retry', None) or
+                          SparkRetryPolicy())
+        retry.statuses = retry.statuses - {429}
+        self.retry = retry
+        self.members = [SparkPoolMember(name, SparkSession(token,
+                                                           retry=retry,
+                                                           container_ttl=0,
+                                                           query_cache_ttl=0,
+                                                           **session_kwargs))
+                        for name, token in tokens.items()]
+        self._rooms = SparkTTLCache(ttl=membership_ttl)
+        # Listings are shared by every token, the members' own are unused
+        self.container_metadata = None
+        if container_ttl:
+            self.container_metadata = SparkQueryCache(container_ttl)
+        self.query_cache = None
+        if query_cache_ttl:
+            self.query_cache = SparkQueryCache(query_cache_ttl)
+
+    @property
+    def primary(self):
+        ''' The first token's member, used for `people/me` '''
+        return self.members[0]
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request('POST', url, data=data, json=json, **kwargs)
+
+    def put(self, url, data=None, json=None, **kwargs):
+        return self.request('PUT', url, data=data, json=json, **kwargs)
+
+    def patch(self, url, data=None, json=None, **kwargs):
+        return self.request('PATCH', url, data=data, json=json, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        '''
+        Send a request with the most suitable token, failing over to
+        another token on a `429` or `401`
+        '''
+        method = method.upper()
+        if method not in READ_METHODS:
+            # Before and after, see :meth:`SparkSession.request`
+            self.invalidate(url)
+            try:
+                return self._send(method, url, kwargs)
+            finally:
+                self.invalidate(url)
+        return self._send(method, url, kwargs)
+
+    def _send(self, method, url, kwargs):
+        ''' Send through the members, failing over between them '''
+        candidates = self._candidates(method, url, kwargs)
+        # Streamed bodies (ie: file uploads) can't be sent twice
+        replayable = not hasattr(kwargs.get('data'), 'read')
+        tried = []
+        attempts = 0
+        while True:
+            member = self._choose(candidates, tried)
+            attempts += 1
+            response = member.request(method, url, **kwargs)
+            status = response.status_code
+            if (status not in (401, 429) or not replayable or
+                    attempts >= self.retry.max_attempts):
+                return response
+            tried.append(member)
+            if self._choose(candidates, tried, ready=True) is not None:
+                member.failover()
+                log.info('%s %s failed over from %s after a %s',
+                         method, url, member.name, status)
+            elif status == 401:
+                return response
+            else:
+                # Every token is backing off, the next attempt waits for
+                # the one ready soonest
+                tried = []
+
+    def invalidate(self, url):
+        ''' Drop the listings a write to `url` may change '''
+        for cache in (self.container_metadata, self.query_cache):
+            if cache is not None:
+                cache.invalidate_url(url)
+        return
+
+    def _choose(self, candidates, tried, ready=False):
+        '''
+        The least busy enabled member not yet tried. Members backing off are
+        used only if every other member is, the one ready soonest first.
+        '''
+        members = [member for member in candidates
+                   if not member.disabled and member not in tried]
+        available = [member for member in members if member.ready]
+        if available:
+            return min(available,
+                       key=lambda member: (member.in_flight, member.requests))
+        if ready:
+            return None
+        if not members:
+            # Every candidate has failed, try the best of them again
+            members = [member for member in candidates
+                       if not member.disabled] or candidates
+        return min(members, key=lambda member: member.session.backoff.remaining)
+
+    def _candidates(self, method, url, kwargs):
+        ''' The members which may send a request '''
+        if url.rstrip('/').endswith('/people/me'):
+            return [self.primary]
+        if method in READ_METHODS:
+            return self.members
+        room_id = self._room_id(url, kwargs)
+        if room_id is None:
+            return self.members
+        return self.room_members(room_id) or self.members
+
+    @staticmethod
+    def _room_id(url, kwargs):
+        ''' The room a write applies to, if it can be told from the request '''
+        for body in (kwargs.get('json'), kwargs.get('data')):
+            if isinstance(body, dict) and body.get('roomId'):
+                return body['roomId']
+        fields = getattr(kwargs.get('data'), 'fields', None)
+        if isinstance(fields, dict) and fields.get('roomId'):
+            # A multipart upload
+            return fields['roomId']
+        resource = url.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        name = endpoint(url)
+        if name == 'rooms' and is_api_id(resource):
+            return resource
+        if name == 'memberships' and is_api_id(resource):
+            # Membership ids are {personId}:{roomId}
+            uuid = decode_api_id(resource)['uuid']
+            if ':' in uuid:
+                return uuid_to_api_id(uuid.split(':')[1], 'rooms')
+        return None
+
+    def room_members(self, room_id):
+        '''
+        The members whose token owner belongs to a room, discovered by
+        fetching the room with each token and cached
+
+        :rtype: list
+        '''
+        names = self._rooms.get(room_id)
+        if names is None:
+            names = []
+            for member in self.members:
+                if member.disabled:
+                    continue
+                response = member.request('GET', API + 'rooms/' + room_id)
+                if response.status_code == 200:
+                    names.append(member.name)
+            if not names:
+                log.warning('No token is a member of %s', room_id)
+            self._rooms.set(room_id, names)
+        return [member for member in self.members if member.name in names]
+
+    def send_file(self, file, data):
+        member = self._choose(self._candidates('POST', API + 'messages',
+                                               {'data': data}), [])
+        return member.session.send_file(file, data)
+
+    def utilization(self):
+        '''
+        Per token counters: `requests`, `in_flight`, `rate_limited`,
+        `unauthorized`, `failovers`, seconds of `backoff` remaining,
+        `disabled`, and bytes `sent` and `received`
+
+        :rtype: dict
+        '''
+        return {member.name: member.stats() for member in self.members}
+
+    def close(self):
+        for member in self.members:
+            member.session.close()
+        return
+
+    def __repr__(self):
+        return f'SparkPoolSession({len(self.members)} tokens)'
+
+
+class SparkPool(Spark):
+    '''
+    A :class:`Spark <Spark>` client which spreads its requests across
+    several bearer tokens
+
+    :param tokens: Bearer tokens, a list or a mapping of name to token
+    :param membership_ttl: (optional) Seconds to cache which tokens are
+                           members of a room. Default: 600
+    :type membership_ttl: float
+    :param weak_parents: (optional) See :class:`Spark <Spark>`
+    :type weak_parents: bool
+    :param \\**session_kwargs: (optional) Passed to each token's
+                              :class:`SparkSession <SparkSession>`
+
+    :attr:`me` and :attr:`id` describe the first token's owner.
+    '''
+
+    def __init__(self, tokens, membership_ttl=600, weak_parents=False,
+                 **session_kwargs):
+        tokens = _named(tokens)
+        super().__init__(next(iter(tokens.values())),
+                         weak_parents=weak_parents)
+        self._session = SparkPoolSession(tokens,
+                                         membership_ttl=membership_ttl,
+                                         **session_kwargs)
+
+    def __repr__(self):
+        return f'SparkPool({len(self.session.members)} tokens)'
+
+
+def _named(tokens):
+    ''' Tokens as a mapping of name to token '''
+    if not hasattr(tokens, 'items'):
+        tokens = {f'token{i}': token for i, token in enumerate(tokens)}
+    if not tokens:
+        raise ValueError('SparkPool requires at least one token')
+    return dict(tokens)
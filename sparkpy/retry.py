@@ -0,0 +1,236 @@
+'''
+sparkpy.retry
+~~~~~~~~~~~~~
+Retry policy and circuit breaker used by :class:`SparkSession <SparkSession>`
+
+Rate limited requests (`429`) are always retried after their `Retry-After`
+period since the API did not process them. Server errors, connection errors
+and timeouts are only retried for idempotent methods, with jittered
+exponential backoff. Every retry is bounded by a maximum number of attempts
+and a total time budget.
+
+The circuit breaker counts consecutive failures per endpoint (`rooms`,
+`messages`, ...). Once an endpoint reaches the threshold further requests
+fail fast with :class:`SparkCircuitOpenError` until the reset timeout has
+passed, when a single trial request is let through.
+
+Usage:
+    >>> from sparkpy import Spark
+    >>> from sparkpy.retry import SparkRetryPolicy, SparkCircuitBreaker
+    >>> spark = Spark(retry=SparkRetryPolicy(max_attempts=3, max_time=30),
+    ...               breaker=SparkCircuitBreaker(failure_threshold=10))
+'''
+
+import time
+import random
+import logging
+import threading
+from time import monotonic
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from .exceptions.spark_exceptions import SparkCircuitOpenError
+
+log = logging.getLogger('sparkpy.retry')
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+def endpoint(url):
+    '''
+    The API resource a url belongs to, ie: `rooms` for
+    `https://api.ciscospark.com/v1/rooms/...`
+    '''
+    parts = urlparse(url).path.strip('/').split('/')
+    if parts and parts[0] == 'v1':
+        parts = parts[1:]
+    if parts and parts[0] == 'team' and len(parts) > 1:
+        return 'team/' + parts[1]
+    return parts[0] if parts else ''
+
+
+def retry_after_seconds(value):
+    '''
+    Seconds to wait from a `Retry-After` header, given as a number of
+    seconds or an HTTP date. `None` if it can't be parsed
+    '''
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class SparkRetryPolicy(object):
+    '''
+    Decides whether and when a request is retried
+
+    :param max_attempts: (optional) Total attempts including the first.
+                         Default: 5
+    :type max_attempts: int
+    :param max_time: (optional) Seconds after which no further attempts are
+                     started, including time spent waiting. Default: 120
+    :type max_time: float
+    :param backoff_base: (optional) Base delay in seconds. Default: 0.5
+    :type backoff_base: float
+    :param backoff_max: (optional) Maximum delay in seconds. Default: 30
+    :type backoff_max: float
+    :param statuses: (optional) Response status codes to retry
+    :param methods: (optional) Methods safe to retry after a server error
+                    or a connection failure
+    '''
+
+    def __init__(self,
+                 max_attempts=5,
+                 max_time=120,
+                 backoff_base=0.5,
+                 backoff_max=30,
+                 statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS):
+        self.max_attempts = max_attempts
+        self.max_time = max_time
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+
+    def retryable(self, method, response=None, error=None):
+        '''
+        Returns `True` if the outcome of a request may be retried
+
+        :param method: The HTTP method
+        :param response: The response, if one was received
+        :param error: The exception raised, if no response was received
+        :rtype: bool
+        '''
+        if response is not None:
+            if response.status_code == 429:
+                return 429 in self.statuses
+            return response.status_code in self.statuses and \
+                method.upper() in self.methods
+        return error is not None and method.upper() in self.methods
+
+    def delay(self, attempt, response=None):
+        '''
+        Seconds to wait before the next attempt
+
+        Uses the `Retry-After` header when present, in seconds or as an
+        HTTP date, otherwise exponential backoff with full jitter.
+
+        :param attempt: The number of attempts made so far
+        :type attempt: int
+        :rtype: float
+        '''
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                seconds = retry_after_seconds(retry_after)
+                if seconds is not None:
+                    return seconds
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def allows(self, attempt, started, delay):
+        '''
+        Returns `True` if another attempt fits the attempt and time budget
+
+        :param attempt: The number of attempts made so far
+        :param started: `monotonic()` when the first attempt was made
+        :param delay: The wait before the next attempt
+        :rtype: bool
+        '''
+        return attempt < self.max_attempts and \
+            monotonic() - started + delay <= self.max_time
+
+    def __repr__(self):
+        return f'SparkRetryPolicy({self.max_attempts}, {self.max_time})'
+
+
+class SparkCircuitBreaker(object):
+    '''
+    Per endpoint circuit breaker
+
+    :param failure_threshold: (optional) Consecutive failures which open
+                              the circuit. Default: 5
+    :type failure_threshold: int
+    :param reset_timeout: (optional) Seconds the circuit stays open before
+                          a trial request is allowed. Default: 30
+    :type reset_timeout: float
+    '''
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened = {}
+        self._trial = set()
+        self._lock = threading.Lock()
+
+    def state(self, name):
+        '''
+        The state of an endpoint's circuit,
+        one of `closed`, `open` or `half-open`
+        '''
+        opened = self._opened.get(name)
+        if opened is None:
+            return self.CLOSED
+        if monotonic() - opened >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before(self, name):
+        '''
+        Called before a request is sent
+
+        :raises: :class:`SparkCircuitOpenError` if the circuit is open, or
+                 half-open with a trial request already in flight
+        '''
+        if name not in self._opened:
+            return
+        with self._lock:
+            state = self.state(name)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and name not in self._trial:
+                self._trial.add(name)
+                log.info('Trying the %s endpoint again', name)
+                return
+            retry_in = self.reset_timeout - (monotonic() - self._opened[name])
+        raise SparkCircuitOpenError(name, max(retry_in, 0))
+
+    def success(self, name):
+        ''' Record a successful request, closing the circuit '''
+        if self._failures.get(name) or name in self._opened:
+            with self._lock:
+                self._failures.pop(name, None)
+                self._opened.pop(name, None)
+                self._trial.discard(name)
+        return
+
+    def failure(self, name):
+        ''' Record a failed request, opening the circuit at the threshold '''
+        with self._lock:
+            failures = self._failures.get(name, 0) + 1
+            self._failures[name] = failures
+            if name in self._trial or failures >= self.failure_threshold:
+                if name not in self._opened or name in self._trial:
+                    log.warning('Opening the circuit for the %s endpoint '
+                                'after %s failures', name, failures)
+                self._opened[name] = monotonic()
+                self._trial.discard(name)
+        return
+
+    def __repr__(self):
+        return (f'SparkCircuitBreaker({self.failure_threshold}, '
+                f'{self.reset_timeout})')
@@ -0,0 +1,291 @@
+'''
+sparkpy.search
+~~~~~~~~~~~~~~
+A local full text index of Cisco Spark messages backed by SQLite FTS5
+
+Messages can be added from the exports written by :mod:`sparkpy.export`,
+from any iterable of messages, or synced directly from a room. Syncing is
+incremental, only messages newer than those seen by the last complete sync
+of the room are fetched. An interrupted sync leaves that watermark in place
+so the next one picks up the pages it missed.
+
+Usage:
+    >>> from sparkpy.search import SparkSearchIndex
+    >>> index = SparkSearchIndex('messages.db')
+    >>> index.add_jsonl('room.jsonl.gz')
+    >>> index.sync_room(spark.rooms[0])
+    >>> index.search('lunch', person='panholt@gmail.com', since='2017-08-01')
+'''
+
+import gzip
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+from .models.container import paginate
+from .models.message import SparkMessage
+from .models.time import SparkTime
+
+log = logging.getLogger('sparkpy.search')
+
+FIELDS = ('id', 'roomId', 'personId', 'personEmail', 'created', 'text')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    roomId TEXT,
+    personId TEXT,
+    personEmail TEXT,
+    created TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_room ON messages (roomId, created);
+CREATE INDEX IF NOT EXISTS messages_person_id ON messages (personId, created);
+CREATE INDEX IF NOT EXISTS messages_person_email
+    ON messages (personEmail, created);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+    USING fts5(text, content='messages', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text)
+        VALUES ('delete', old.rowid, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text)
+        VALUES ('delete', old.rowid, old.text);
+    INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+END;
+CREATE TABLE IF NOT EXISTS sync_state (
+    roomId TEXT PRIMARY KEY,
+    latest TEXT
+);
+'''
+
+UPSERT = '''
+INSERT INTO messages (id, roomId, personId, personEmail, created, text)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    roomId = excluded.roomId,
+    personId = excluded.personId,
+    personEmail = excluded.personEmail,
+    created = excluded.created,
+    text = excluded.text
+'''
+
+
+def _timestamp(value):
+    '''
+    Normalise a timestamp to the API's fixed ISO-8601 format.
+    Timestamps in that format sort lexicographically.
+    '''
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, SparkTime):
+        return value.ts
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S.%f')[:23] + 'Z'
+    raise TypeError('Timestamps must be a str, datetime or SparkTime')
+
+
+def _row(message):
+    if isinstance(message, SparkMessage):
+        message = {field: getattr(message, field) for field in FIELDS}
+    row = tuple(message.get(field) for field in FIELDS)
+    return row[:4] + (_timestamp(row[4]), row[5])
+
+
+class SparkSearchIndex(object):
+    '''
+    Full text index of Cisco Spark messages
+
+    :param path: (optional) Path to the SQLite database.
+                 Default: an in-memory database
+    :type path: str
+    :param batch_size: (optional) Rows inserted per transaction
+    :type batch_size: int
+    '''
+
+    def __init__(self, path=':memory:', batch_size=5000):
+        self._path = path
+        self._batch_size = batch_size
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+
+    @property
+    def path(self):
+        ''' Path to the SQLite database '''
+        return self._path
+
+    def add(self, messages):
+        '''
+        Add or update messages in the index
+
+        :param messages: An iterable of message dictionaries, as returned
+                         by the API or written by :mod:`sparkpy.export`, or
+                         :class:`SparkMessage <SparkMessage>` objects
+        :return: The number of messages indexed
+        :rtype: int
+        '''
+        count = 0
+        rows = map(_row, messages)
+        while True:
+            batch = list(islice(rows, self._batch_size))
+            if not batch:
+                return count
+            with self._db:
+                self._db.executemany(UPSERT, batch)
+            count += len(batch)
+
+    def add_jsonl(self, path):
+        '''
+        Add the messages of a JSONL export, gzipped or not
+
+        :param path: The exported file
+        :type path: str
+        :return: The number of messages indexed
+        :rtype: int
+        '''
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return self.add(json.loads(line) for line in f if line.strip())
+
+    def sync_room(self, room, per_page=500):
+        '''
+        Fetch and index any messages in `room` newer than the last sync
+
+        Messages are listed newest first so paging stops at the first
+        message the last sync saw. The room's watermark only moves once
+        the whole pass has been indexed.
+
+        :param room: The room to sync
+        :type room: :class:`SparkRoom <SparkRoom>`
+        :return: The number of new messages indexed
+        :rtype: int
+        '''
+        latest = self.latest(room.id)
+        params = dict(room.message_params, max=per_page)
+        count = 0
+        newest = None
+        for items, next_page in paginate(room.session,
+                                         SparkMessage.API_BASE,
+                                         params=params):
+            new = [item for item in items
+                   if latest is None or item['created'] > latest]
+            count += self.add(new)
+            newest = max([newest or ''] + [item['created'] for item in new])
+            if len(new) < len(items):
+                break
+        if newest:
+            self._set_latest(room.id, newest)
+        log.debug('Indexed %s new messages from %s', count, room.id)
+        return count
+
+    def latest(self, room_id):
+        '''
+        The `created` timestamp of the newest message seen by the last
+        complete sync of a room
+
+        :rtype: str
+        '''
+        row = self._db.execute('SELECT latest FROM sync_state '
+                               'WHERE roomId = ?', (room_id,)).fetchone()
+        return row['latest'] if row else None
+
+    def search(self,
+               text=None,
+               person=None,
+               room=None,
+               since=None,
+               until=None,
+               limit=50):
+        '''
+        Query the index
+
+        All arguments are optional and combined with `AND`.
+
+        :param text: An FTS5 query, ie: `lunch OR dinner`, `"exact phrase"`
+        :type text: str
+        :param person: A personId or email address
+        :type person: str
+        :param room: A roomId
+        :type room: str
+        :param since: Only messages created at or after this time
+        :type since: str, datetime or SparkTime
+        :param until: Only messages created before this time
+        :type until: str, datetime or SparkTime
+        :param limit: Maximum number of results. Default: 50
+        :type limit: int
+
+        :return: Matching messages, best match first when `text` is given,
+                 otherwise newest first
+        :rtype: list of dict
+        '''
+        clauses = []
+        args = []
+        if text:
+            query = ('SELECT m.* FROM messages_fts '
+                     'JOIN messages m ON m.rowid = messages_fts.rowid')
+            clauses.append('messages_fts MATCH ?')
+            args.append(text)
+            order = 'messages_fts.rank'
+        else:
+            query = 'SELECT m.* FROM messages m'
+            order = 'm.created DESC'
+        if person:
+            clauses.append('m.personEmail = ?' if '@' in person
+                           else 'm.personId = ?')
+            args.append(person)
+        if room:
+            clauses.append('m.roomId = ?')
+            args.append(room)
+        if since:
+            clauses.append('m.created >= ?')
+            args.append(_timestamp(since))
+        if until:
+            clauses.append('m.created < ?')
+            args.append(_timestamp(until))
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += f' ORDER BY {order} LIMIT ?'
+        args.append(limit)
+        return [dict(row) for row in self._db.execute(query, args)]
+
+    def optimize(self):
+        ''' Merge the FTS index segments, worthwhile after large imports '''
+        with self._db:
+            self._db.execute("INSERT INTO messages_fts (messages_fts) "
+                             "VALUES ('optimize')")
+        return
+
+    def close(self):
+        self._db.close()
+        return
+
+    def _set_latest(self, room_id, latest):
+        with self._db:
+            self._db.execute('INSERT INTO sync_state (roomId, latest) '
+                             'VALUES (?, ?) ON CONFLICT (roomId) DO UPDATE '
+                             'SET latest = max(latest, excluded.latest)',
+                             (room_id, latest))
+        return
+
+    def __len__(self):
+        return self._db.execute('SELECT count(*) FROM messages').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f'SparkSearchIndex("{self._path}")'
@@ -1,20 +1,226 @@
 # -*- coding: utf-8 -*-
 
 import os
+import gzip
 import logging
-import mimetypes
-from time import sleep
+import threading
+from time import sleep, monotonic
+from functools import partial
 
-import requests
-from requests_toolbelt import MultipartEncoder
+from . import codec
+from .cache import SparkTTLCache, SparkQueryCache, SparkSingleFlight
+from .retry import SparkRetryPolicy, SparkCircuitBreaker, endpoint
+from .utils import SparkHeaders
 
 log = logging.getLogger('sparkpy.session')
 
 
-class SparkSession(requests.Session):
+class SparkBackoff(object):
+    '''
+    Backoff state shared by every thread using a session. A `429` received
+    by any thread pauses new requests from all of them until the
+    `Retry-After` period has passed.
 
-    def __init__(self, bearer_token=None):
-        super().__init__()
+    Reads are lock-free, only recording a backoff takes the lock.
+    '''
+
+    def __init__(self):
+        self._until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        ''' Seconds left before requests may be sent '''
+        return max(self._until - monotonic(), 0.0)
+
+    def backoff(self, seconds):
+        ''' Hold requests for at least `seconds` from now '''
+        with self._lock:
+            self._until = max(self._until, monotonic() + seconds)
+        return
+
+    def wait(self):
+        ''' Block until the backoff period is over '''
+        delay = self.remaining
+        while delay > 0:
+            sleep(delay)
+            # Another thread may have extended it while we slept
+            delay = self.remaining
+        return
+
+
+class SparkTransferStats(object):
+    '''
+    Bytes sent and received per API endpoint
+
+    Each endpoint counts `requests`, `sent` and `received` bytes as they
+    crossed the wire, and `sent_uncompressed` and `received_uncompressed`
+    body sizes, so the saving from compression is the difference.
+    '''
+
+    FIELDS = ('requests',
+              'sent',
+              'sent_uncompressed',
+              'received',
+              'received_uncompressed')
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self,
+               name,
+               sent=0,
+               sent_uncompressed=0,
+               received=0,
+               received_uncompressed=0):
+        ''' Add a request's byte counts to the endpoint `name` '''
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = dict.fromkeys(self.FIELDS, 0)
+            stats['requests'] += 1
+            stats['sent'] += sent
+            stats['sent_uncompressed'] += sent_uncompressed
+            stats['received'] += received
+            stats['received_uncompressed'] += received_uncompressed
+        return
+
+    def snapshot(self):
+        '''
+        :return: A copy of the counts, keyed by endpoint
+        :rtype: dict
+        '''
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def totals(self):
+        '''
+        :return: The counts summed over every endpoint
+        :rtype: dict
+        '''
+        totals = dict.fromkeys(self.FIELDS, 0)
+        for stats in self.snapshot().values():
+            for field in self.FIELDS:
+                totals[field] += stats[field]
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+        return
+
+    def __repr__(self):
+        return 'SparkTransferStats'
+
+
+class SparkSession(object):
+    '''
+    An HTTP session bound to a single bearer token
+
+    :param bearer_token: (optional) The bearer token, defaults to the
+                         `SPARK_TOKEN` environment variable
+    :param transport: (optional) The transport requests are sent with.
+                      Default: a :class:`RequestsTransport` built from the
+                      pool options below
+    :type transport: :class:`SparkTransport <SparkTransport>`
+    :param pool_connections: (optional) Number of hosts to keep connection
+                             pools for. Default: 10
+    :type pool_connections: int
+    :param pool_maxsize: (optional) Maximum connections kept per host.
+                         Size this to the number of threads sharing the
+                         session. Default: 10
+    :type pool_maxsize: int
+    :param pool_block: (optional) Wait for a free connection instead of
+                       opening and discarding extra ones when the pool is
+                       exhausted. Default: `False`
+    :type pool_block: bool
+    :param timeout: (optional) Default `(connect, read)` timeout in seconds
+                    for every request, or a single number for both.
+                    Default: `(10, 60)`
+    :type timeout: tuple
+    :param keep_alive: (optional) Reuse connections and enable TCP
+                       keep-alive probes. If `False` every request sends
+                       `Connection: close`. Default: `True`
+    :type keep_alive: bool
+    :param thread_safe: (optional) Send each thread's requests through its
+                        own underlying :class:`requests.Session`. The
+                        sessions share one connection pool, so set
+                        `pool_maxsize` to the number of threads.
+                        Default: `False`
+    :type thread_safe: bool
+    :param retry: (optional) The retry policy.
+                  Default: :class:`SparkRetryPolicy() <SparkRetryPolicy>`
+    :type retry: :class:`SparkRetryPolicy <SparkRetryPolicy>`
+    :param breaker: (optional) A circuit breaker, `False` disables it.
+                    Default: a new
+                    :class:`SparkCircuitBreaker <SparkCircuitBreaker>`
+    :type breaker: :class:`SparkCircuitBreaker <SparkCircuitBreaker>`
+    :param coalesce: (optional) Share a single request between threads
+                     making identical `GET` requests at the same time.
+                     Default: `True`
+    :type coalesce: bool
+    :param response_cache_ttl: (optional) Seconds to serve successful `GET`
+                               responses from memory. Writes to an endpoint
+                               drop its cached responses. Default: 0, off
+    :type response_cache_ttl: float
+    :param container_ttl: (optional) Seconds to remember the page boundaries
+                          and total count of listings, shared by every
+                          :class:`SparkContainer <SparkContainer>` over the
+                          same query. Writes to an endpoint drop its
+                          listings. Default: 0, off
+    :type container_ttl: float
+    :param query_cache_ttl: (optional) Seconds to serve the pages of
+                            listings, ie: `room.members`, from memory. A
+                            mapping of resource to seconds sets lifetimes
+                            per resource, ie: `{'memberships': 60,
+                            'default': 10}`. Writes to a resource drop its
+                            listings, and those filtered by the id written.
+                            Default: 0, off
+    :type query_cache_ttl: float or dict
+    :param compression: (optional) Accept compressed responses in every
+                        encoding the transport can decode, br if a brotli
+                        decoder is installed and gzip. Default: `True`
+    :type compression: bool
+    :param compress_threshold: (optional) gzip `POST`, `PUT` and `PATCH`
+                               bodies of at least this many bytes.
+                               Default: `None`, never
+    :type compress_threshold: int
+
+    The pool options and `thread_safe` configure the default transport and
+    are ignored when a `transport` is given.
+
+    Bytes sent and received are counted per endpoint in :attr:`transfer`,
+    a :class:`SparkTransferStats`. Streamed responses are counted when they
+    are closed.
+
+    Requests are retried according to the retry policy. `429` responses
+    wait for their `Retry-After` period and that backoff is shared, so while
+    one thread is backing off the others hold their requests too rather
+    than adding to the rate limit. When retries are exhausted the last
+    response is returned, or the last connection error raised.
+
+    .. note:: The headers and hooks must be configured before the session
+              is shared between threads.
+    '''
+
+    def __init__(self,
+                 bearer_token=None,
+                 transport=None,
+                 pool_connections=10,
+                 pool_maxsize=10,
+                 pool_block=False,
+                 timeout=(10, 60),
+                 keep_alive=True,
+                 thread_safe=False,
+                 retry=None,
+                 breaker=True,
+                 coalesce=True,
+                 response_cache_ttl=0,
+                 container_ttl=0,
+                 query_cache_ttl=0,
+                 compression=True,
+                 compress_threshold=None):
         if not bearer_token:
             try:
                 self._bearer_token = os.environ['SPARK_TOKEN']
@@ -22,12 +228,276 @@ class SparkSession(requests.Session):
                 raise Exception('SparkSession Requires a bearer token')
         else:
             self._bearer_token = bearer_token
-        self.headers.update({'Authorization': 'Bearer ' + self._bearer_token,
-                             'Content-type': 'application/json; charset=utf-8'
-                             })
+        self.headers = SparkHeaders({
+            'Authorization': 'Bearer ' + self._bearer_token,
+            'Content-type': 'application/json; charset=utf-8'})
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
         self.hooks = {'response': [self._retry_after_hook]}
+        self.timeout = timeout
+        if transport is None:
+            # Imported here so `requests` is only loaded once it's needed
+            from .transport import RequestsTransport
+            transport = RequestsTransport(pool_connections=pool_connections,
+                                          pool_maxsize=pool_maxsize,
+                                          pool_block=pool_block,
+                                          keep_alive=keep_alive,
+                                          thread_safe=thread_safe)
+        self.transport = transport
+        if not compression:
+            self.headers['Accept-Encoding'] = 'identity'
+        elif transport.encodings:
+            self.headers['Accept-Encoding'] = ', '.join(transport.encodings)
+        self.compress_threshold = compress_threshold
+        self.transfer = SparkTransferStats()
+        self.backoff = SparkBackoff()
+        self.retry = retry or SparkRetryPolicy()
+        if breaker is True:
+            breaker = SparkCircuitBreaker()
+        self.breaker = breaker or None
+        self.coalesce = coalesce
+        self.flight = SparkSingleFlight()
+        self.response_cache = None
+        if response_cache_ttl:
+            self.response_cache = SparkTTLCache(ttl=response_cache_ttl)
+        self.container_metadata = None
+        if container_ttl:
+            self.container_metadata = SparkQueryCache(container_ttl)
+        self.query_cache = None
+        if query_cache_ttl:
+            self.query_cache = SparkQueryCache(query_cache_ttl)
+
+    @property
+    def thread_safe(self):
+        ''' `True` if the transport gives each thread its own session '''
+        return getattr(self.transport, 'thread_safe', False)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request('POST', url, data=data, json=json, **kwargs)
+
+    def put(self, url, data=None, json=None, **kwargs):
+        return self.request('PUT', url, data=data, json=json, **kwargs)
+
+    def patch(self, url, data=None, json=None, **kwargs):
+        return self.request('PATCH', url, data=data, json=json, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def request(self,
+                method,
+                url,
+                params=None,
+                data=None,
+                headers=None,
+                json=None,
+                timeout=None,
+                stream=False,
+                **options):
+        '''
+        Send a request through the transport
+
+        :param method: The HTTP method
+        :param url: The full url
+        :param params: (optional) URL parameters
+        :type params: dict
+        :param data: (optional) The body, `bytes` or a file like object
+        :param headers: (optional) Headers merged over the session's
+        :type headers: dict
+        :param json: (optional) An object sent as the body, encoded with
+                     the :mod:`sparkpy.codec` backend
+        :param timeout: (optional) Overrides the session's default timeout
+        :param stream: (optional) Don't read the body until it's accessed.
+                       Default: `False`
+        :param \**options: (optional) Other options passed to the transport,
+                           ie: `files`, `allow_redirects`, `cookies` or
+                           `verify` for the default `requests` transport.
+                           Requests with them are never coalesced or cached
+        :return: The response
+        '''
+        method = method.upper()
+        if json is not None:
+            data = codec.dumps(json)
+        if (self.compress_threshold is not None and
+                method in ('POST', 'PUT', 'PATCH') and
+                isinstance(data, bytes) and
+                len(data) >= self.compress_threshold):
+            data = gzip.compress(data)
+            headers = dict(headers or {}, **{'Content-Encoding': 'gzip'})
+        kwargs = dict(options,
+                      params=params,
+                      data=data,
+                      headers=headers,
+                      timeout=self.timeout if timeout is None else timeout,
+                      stream=stream)
+        if method not in ('GET', 'HEAD', 'OPTIONS'):
+            # Drop what the write may change before it's sent, and again
+            # once it's done, in case a concurrent read cached the old
+            # state while the write was in flight
+            self.invalidate(url)
+            try:
+                return self._request(method, url, **kwargs)
+            finally:
+                self.invalidate(url)
+        cache = self.response_cache
+        if method != 'GET' or stream or options:
+            return self._request(method, url, **kwargs)
+        if not (self.coalesce or cache is not None):
+            return self._request(method, url, **kwargs)
+
+        key = self._request_key(url, kwargs)
+        if cache is not None:
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+        def fetch():
+            response = self._request(method, url, **kwargs)
+            if response.status_code == 200:
+                # Parse once while we're the only holder
+                try:
+                    response.json()
+                except ValueError:
+                    return response
+                if cache is not None:
+                    cache.set(key, response)
+            return response
+
+        if self.coalesce:
+            return self.flight.do(key, fetch)
+        return fetch()
+
+    @staticmethod
+    def _request_key(url, kwargs):
+        params = kwargs.get('params') or ()
+        if hasattr(params, 'items'):
+            params = params.items()
+        headers = kwargs.get('headers') or {}
+        return (endpoint(url),
+                url,
+                tuple(sorted((k, str(v)) for k, v in params)),
+                tuple(sorted(headers.items())))
+
+    def _send(self, method, url, headers=None, attempt=1, **kwargs):
+        '''
+        A single round trip through the transport and response hooks,
+        recording the bytes transferred. Hooks are passed the `attempt`
+        '''
+        merged = self.headers.copy()
+        if headers:
+            merged.update(headers)
+        response = self.transport.request(method, url,
+                                          headers=dict(merged),
+                                          **kwargs)
+        data = kwargs.get('data')
+        sent = _size(data)
+        if sent and merged.get('Content-Encoding') == 'gzip':
+            # The gzip trailer ends with the uncompressed size
+            sent_uncompressed = int.from_bytes(data[-4:], 'little')
+        else:
+            sent_uncompressed = sent
+        record = partial(self._record, endpoint(url), sent, sent_uncompressed)
+        if kwargs.get('stream'):
+            # The body hasn't been read yet
+            response._on_close = record
+        else:
+            record(response)
+        for hook in self.hooks.get('response', ()):
+            response = hook(response, attempt=attempt) or response
+        return response
+
+    def _request(self, method, url, **kwargs):
+        ''' Send a request, applying the retry policy '''
+        name = endpoint(url)
+        # Streamed bodies (ie: file uploads) can't be sent twice
+        replayable = not (hasattr(kwargs.get('data'), 'read') or
+                          kwargs.get('files'))
+        started = monotonic()
+        attempt = 0
+        while True:
+            if self.breaker:
+                self.breaker.before(name)
+            self.backoff.wait()
+            attempt += 1
+            try:
+                response = self._send(method, url, attempt=attempt,
+                                      **kwargs)
+            except self.transport.retry_errors as e:
+                if self.breaker:
+                    self.breaker.failure(name)
+                delay = self.retry.delay(attempt)
+                if not (replayable and
+                        self.retry.retryable(method, error=e) and
+                        self.retry.allows(attempt, started, delay)):
+                    raise
+                log.warning('%s %s failed (%s), retrying in %.1f seconds',
+                            method, url, e, delay)
+                sleep(delay)
+                continue
+            if self.breaker:
+                if response.status_code >= 500:
+                    self.breaker.failure(name)
+                else:
+                    self.breaker.success(name)
+            if not (replayable and self.retry.retryable(method, response)):
+                return response
+            delay = self.retry.delay(attempt, response)
+            if not self.retry.allows(attempt, started, delay):
+                log.warning('Giving up on %s %s after %s attempts',
+                            method, url, attempt)
+                return response
+            # 429 backoff has been recorded by the response hook
+            if response.status_code != 429:
+                log.warning('%s %s returned %s, retrying in %.1f seconds',
+                            method, url, response.status_code, delay)
+                sleep(delay)
+
+    def invalidate(self, url):
+        '''
+        Drop the cached responses and listings a write to `url` may change.
+        Called for every write made through the session.
+        '''
+        if self.response_cache is not None:
+            name = endpoint(url)
+            self.response_cache.invalidate(lambda key: key[0] == name)
+        for cache in (self.container_metadata, self.query_cache):
+            if cache is not None:
+                cache.invalidate_url(url)
+        return
+
+    def _record(self, name, sent, sent_uncompressed, response):
+        self.transfer.record(name,
+                             sent=sent,
+                             sent_uncompressed=sent_uncompressed,
+                             received=response.wire_bytes,
+                             received_uncompressed=response.decoded_bytes)
+        return
+
+    def pool_stats(self):
+        '''
+        Connection pool utilization per host, if the transport reports it.
+        See :meth:`SparkAdapter.pool_stats`
+
+        :rtype: dict
+        '''
+        return self.transport.pool_stats()
+
+    def close(self):
+        ''' Close the transport's pooled connections '''
+        self.transport.close()
+        return
 
     def send_file(self, file, data):
+        # Only needed for uploads, so not imported with the module
+        import mimetypes
+        from requests_toolbelt import MultipartEncoder
+
         filetype = mimetypes.guess_type(file)[0]
         fname = os.path.abspath(file).rsplit(os.sep)[-1]
         data.update({'files': (fname, open(file, 'rb'), filetype)})
@@ -38,13 +508,30 @@ class SparkSession(requests.Session):
         return
 
     # Response session hooks
-    def _retry_after_hook(self, response, *args, **kwargs):
+    def _retry_after_hook(self, response, *args, attempt=1, **kwargs):
         if response.status_code == 429:
-            sleep_time = int(response.headers.get('Retry-After', 15))
-            log.warning('Received a 429 Response. Backing off for %s seconds',
-                        sleep_time)
-            sleep(sleep_time)
-            return self.send(response.request)
+            # The same wait the retry policy gives the request
+            sleep_time = self.retry.delay(attempt, response)
+            log.warning('Received a 429 Response. Backing off for %.1f '
+                        'seconds', sleep_time)
+            self.backoff.backoff(sleep_time)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def __repr__(self):
         return 'SparkSession'
+
+
+def _size(data):
+    ''' The length of a request body, if it can be known without reading it '''
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, bytes):
+        return len(data)
+    return getattr(data, 'len', 0)
@@ -26,14 +26,11 @@ There are many more features added please consult the documentation at
 
 
 from os import environ
+from threading import Lock
 from .utils import is_api_id
 from .session import SparkSession
-from .models.room import SparkRoom
-from .models.team import SparkTeam
-from .models.people import SparkPerson
-from .models.webhook import SparkWebhook
-from .models.container import SparkContainer
-from json.decoder import JSONDecodeError
+# The models are imported where they're used, creating a client doesn't
+# load them
 
 class Spark(object):
     '''
@@ -43,23 +40,41 @@ class Spark(object):
     :param token: (optional) The bearer token for the Cisco Spark API
                   If this paramater is not provided then the token is
                   taken from the `SPARK_TOKEN` environment variable
+    :param weak_parents: (optional) Models hold their parent model, ie: the
+                         room of a membership, by weak reference so it can
+                         be released while they're alive. A model whose
+                         parent was released has a `parent` of `False`.
+                         The client itself is always held. Default: `False`
+    :type weak_parents: bool
+    :param \**session_kwargs: (optional) Transport, connection pool and
+                             timeout settings passed to
+                             :class:`SparkSession <SparkSession>`
     Usage:
       >>> from sparkpy import Spark
       >>> spark = Spark()
+      >>> # Shared by 32 worker threads
+      >>> spark = Spark(pool_maxsize=32, timeout=(5, 30), thread_safe=True)
+      >>> # HTTP/2 via httpx
+      >>> from sparkpy.transport import HttpxTransport
+      >>> spark = Spark(transport=HttpxTransport())
     '''
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, weak_parents=False, **session_kwargs):
+        self.weak_parents = weak_parents
         self._id = None
         self._me = None
         self._is_bot = None
-        if token:
-            self._session = SparkSession(token)
-        else:
+        if not token:
             try:
-                self._session = SparkSession(environ['SPARK_TOKEN'])
+                token = environ['SPARK_TOKEN']
             except KeyError as e:
                 # TODO exceptions
                 raise Exception('Please insert token')
+        # The session is built on first use
+        self._token = token
+        self._session_kwargs = session_kwargs
+        self._session = None
+        self._session_lock = Lock()
 
     @property
     def id(self):
@@ -76,9 +91,14 @@ class Spark(object):
     def session(self):
         '''
         A :class:`SparkSession <SparkSession>` object.
-        A subclassed requests session, bound to a single :class:`Spark <Spark>`
-        instance so `429` Responses are handled properly
+        A session bound to a single :class:`Spark <Spark>` instance so `429`
+        Responses are handled properly. It's created on first access.
         '''
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = SparkSession(self._token,
+                                                 **self._session_kwargs)
         return self._session
 
     @property
@@ -107,6 +127,8 @@ class Spark(object):
         Also provides dict style lookups using a `roomId`, list style indexing,
         and slicing.
         '''
+        from .models.container import SparkContainer
+        from .models.room import SparkRoom
         return SparkContainer(SparkRoom, parent=self)
 
     @property
@@ -118,6 +140,8 @@ class Spark(object):
         Also provides dict style lookups using a `teamId`, list style indexing,
         and slicing.
         '''
+        from .models.container import SparkContainer
+        from .models.team import SparkTeam
         return SparkContainer(SparkTeam, parent=self)
 
     @property
@@ -129,8 +153,29 @@ class Spark(object):
         Also provides dict style lookups using a `roomId`, list style indexing,
         and slicing.
         '''
+        from .models.container import SparkContainer
+        from .models.webhook import SparkWebhook
         return SparkContainer(SparkWebhook, parent=self)
 
+    def pipeline(self, max_workers=8):
+        '''
+        Batch calls and run them concurrently when the `with` block exits
+
+        :param max_workers: (optional) Maximum calls in flight at once.
+                            Default: 8
+        :type max_workers: int
+        :return: :class:`SparkPipeline <SparkPipeline>`
+
+        Usage:
+            >>> with spark.pipeline() as pipeline:
+            ...     rooms = [pipeline.load(spark.rooms[room_id])
+            ...              for room_id in room_ids]
+            ...     pipeline.spark.create_room('Launch')
+            >>> pipeline.results
+        '''
+        from .pipeline import SparkPipeline
+        return SparkPipeline(self, max_workers=max_workers)
+
     def search_people(self, query, org_id=None, max_=None):
         '''
         Query the Cisco Spark API for people.
@@ -140,6 +185,8 @@ class Spark(object):
         :param org_id: (optional) A Cisco Spark Organization id
         :param max_: (optional) `int` limit the results to `max` numbers
         '''
+        from .models.container import SparkContainer
+        from .models.people import SparkPerson
         params = {}
         if is_api_id(query, 'people'):
             params.update({'id'})
@@ -162,11 +209,12 @@ class Spark(object):
 
         :raises: `Exception`
         '''
+        from .models.people import SparkPerson
         resp = self.session.get('https://api.ciscospark.com/v1/people/me')
         if resp.status_code == 200:
             try:
                 data = resp.json()
-            except JSONDecodeError:
+            except ValueError:
                 # TODO exceptions
                 raise Exception('Failed to retrieve self details')
 
@@ -190,6 +238,7 @@ class Spark(object):
                 :return: :class:`SparkRoom <SparkRoom>`
         '''
 
+        from .models.room import SparkRoom
         data = {'title': title}
         if team_id:
             assert is_api_id(team_id, 'team')
@@ -212,6 +261,7 @@ class Spark(object):
         :return: :class:`SparkRoom <SparkRoom>`
         '''
 
+        from .models.people import SparkPerson
         isinstance(message, str) and len(message) > 0
         if isinstance(person, SparkPerson) or is_api_id(person):
             message = self.send_message(message, person_id=person.id)
@@ -231,6 +281,7 @@ class Spark(object):
                 :return: SparkTeam
             '''
 
+        from .models.team import SparkTeam
         team = self.post('teams', json={'name': name})
         return SparkTeam(self, **team.json())
 
@@ -268,6 +319,7 @@ class Spark(object):
 
                 :raises: AssertionError
             '''
+        from .models.webhook import SparkWebhook
         assert resource in SparkWebhook.WEBHOOK_RESOURCES
         assert event in SparkWebhook.WEBHOOK_EVENTS
         data = {'name': name,
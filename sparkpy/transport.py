@@ -0,0 +1,612 @@
+'''
+sparkpy.transport
+~~~~~~~~~~~~~~~~~
+HTTP transports used by :class:`SparkSession <SparkSession>`
+
+The session handles authentication, retries, backoff and coalescing, and
+hands each individual request to a transport. Three are provided:
+
+* :class:`RequestsTransport` - the default, built on `requests`
+* :class:`HttpxTransport` - `httpx` with HTTP/2, an optional dependency
+  (`pip install httpx[http2]`)
+* :class:`InMemoryTransport` - routes requests to python callables,
+  for tests and benchmarks
+
+Responses returned by a transport provide the subset of the
+:class:`requests.Response` interface sparkpy uses: `status_code`, `headers`,
+`links`, `json()`, `content`, `text`, `iter_content()`, `request` and
+`close()`. For transfer accounting they also count the body's
+`wire_bytes`, as received and possibly compressed, and its `decoded_bytes`.
+
+Usage:
+    >>> from sparkpy import Spark
+    >>> from sparkpy.transport import HttpxTransport
+    >>> spark = Spark(transport=HttpxTransport(http2=True))
+'''
+
+import gzip
+import socket
+import threading
+from abc import ABC, abstractmethod
+from functools import partial
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from . import codec
+from .utils import SparkHeaders
+
+# TCP keep-alive probing for idle pooled connections, where supported
+KEEPALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+for _name, _value in (('TCP_KEEPIDLE', 60),
+                      ('TCP_KEEPINTVL', 15),
+                      ('TCP_KEEPCNT', 4)):
+    if hasattr(socket, _name):
+        KEEPALIVE_OPTIONS.append((socket.IPPROTO_TCP,
+                                  getattr(socket, _name),
+                                  _value))
+
+
+def _brotli():
+    ''' `True` if a brotli decoder is installed '''
+    for name in ('brotli', 'brotlicffi'):
+        try:
+            __import__(name)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def _preferred(accept_encoding):
+    '''
+    The known codings of an `Accept-Encoding` value, most preferred first.
+    Codings this module doesn't rank are left out.
+    '''
+    offered = {coding.strip() for coding in accept_encoding.split(',')}
+    return tuple(coding for coding in ('br', 'zstd', 'gzip', 'deflate')
+                 if coding in offered)
+
+
+def parse_links(value):
+    '''
+    Parse a `Link` header into a dictionary keyed by `rel`,
+    the same shape as :attr:`requests.Response.links`
+    '''
+    links = {}
+    for link in (value or '').split(','):
+        if '<' not in link:
+            continue
+        url, _, params = link.partition(';')
+        entry = {'url': url.strip(' <>')}
+        for param in params.split(';'):
+            key, _, val = param.partition('=')
+            if key.strip():
+                entry[key.strip()] = val.strip(' "\'')
+        links[entry.get('rel') or entry['url']] = entry
+    return links
+
+
+class SparkTransport(ABC):
+    '''
+    Abstract base class for transports
+
+    Attributes:
+        retry_errors (tuple): Exceptions raised for failed connections and
+                              timeouts, which the session may retry
+        encodings (tuple): Content codings the transport decodes, most
+                           preferred first, for `Accept-Encoding`
+    '''
+
+    retry_errors = (ConnectionError, TimeoutError)
+    encodings = ()
+
+    @abstractmethod
+    def request(self,
+                method,
+                url,
+                headers=None,
+                params=None,
+                data=None,
+                timeout=None,
+                stream=False,
+                **options):
+        '''
+        Send a single request
+
+        :param method: The HTTP method
+        :param url: The full url
+        :param headers: All headers to send
+        :type headers: dict
+        :param params: URL paramaters
+        :type params: dict
+        :param data: The body, `bytes` or a file like object
+        :param timeout: A `(connect, read)` tuple or a number
+        :param stream: Don't read the body until it's accessed
+        :param \**options: Other options the transport supports
+        :return: A response object
+        '''
+
+    def pool_stats(self):
+        ''' Connection pool utilization, if the transport can report it '''
+        return {}
+
+    def close(self):
+        ''' Release any pooled connections '''
+        return
+
+
+# ----------------------------------------------------------------! requests
+class SparkResponse(requests.Response):
+    '''
+    A :class:`requests.Response` which parses its body once, with the
+    :mod:`sparkpy.codec` JSON backend. Coalesced and cached responses are
+    shared between callers, which should treat the parsed JSON as read only.
+    '''
+
+    decoded_bytes = 0
+    _on_close = None
+
+    @property
+    def wire_bytes(self):
+        ''' Body bytes read from the connection so far '''
+        try:
+            return self.raw.tell()
+        except AttributeError:
+            return self.decoded_bytes
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        # Also used by requests to read `content`
+        for chunk in super().iter_content(chunk_size, decode_unicode):
+            if isinstance(chunk, bytes):
+                self.decoded_bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        callback, self._on_close = self._on_close, None
+        if callback:
+            callback(self)
+        super().close()
+
+    def json(self, **kwargs):
+        if kwargs:
+            return super().json(**kwargs)
+        try:
+            return self._json
+        except AttributeError:
+            self._json = codec.loads(self.content)
+            return self._json
+
+
+class SparkAdapter(HTTPAdapter):
+    '''
+    A :class:`requests.adapters.HTTPAdapter` which can enable TCP keep-alive
+    on the pooled connections
+
+    :param keep_alive: Enable TCP keep-alive probes
+    :type keep_alive: bool
+    '''
+
+    def __init__(self, *args, keep_alive=True, **kwargs):
+        self._keep_alive = keep_alive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._keep_alive:
+            from urllib3.connection import HTTPConnection
+            kwargs['socket_options'] = (HTTPConnection.default_socket_options +
+                                        KEEPALIVE_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        response.__class__ = SparkResponse
+        return response
+
+    def pool_stats(self):
+        '''
+        Utilization of each host's connection pool
+
+        :return: Mapping of `host:port` to a dict of `maxsize`, `in_use`,
+                 `idle`, `connections` (opened) and `requests`
+        :rtype: dict
+        '''
+        stats = {}
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            queue = pool.pool
+            stats[f'{pool.host}:{pool.port}'] = {
+                'maxsize': queue.maxsize,
+                # The queue is filled with None placeholders until
+                # connections are returned to it
+                'in_use': queue.maxsize - queue.qsize(),
+                'idle': sum(1 for conn in list(queue.queue) if conn),
+                'connections': pool.num_connections,
+                'requests': pool.num_requests}
+        return stats
+
+
+class RequestsTransport(SparkTransport):
+    '''
+    The default transport, built on :class:`requests.Session`
+
+    :param pool_connections: (optional) Number of hosts to keep connection
+                             pools for. Default: 10
+    :type pool_connections: int
+    :param pool_maxsize: (optional) Maximum connections kept per host.
+                         Size this to the number of threads sharing the
+                         session. Default: 10
+    :type pool_maxsize: int
+    :param pool_block: (optional) Wait for a free connection instead of
+                       opening and discarding extra ones when the pool is
+                       exhausted. Default: `False`
+    :type pool_block: bool
+    :param keep_alive: (optional) Enable TCP keep-alive probes.
+                       Default: `True`
+    :type keep_alive: bool
+    :param thread_safe: (optional) Send each thread's requests through its
+                        own :class:`requests.Session`. The sessions share one
+                        connection pool. Default: `False`
+    :type thread_safe: bool
+    '''
+
+    retry_errors = (requests.ConnectionError, requests.Timeout)
+    # urllib3 adds br and zstd when their decoders are installed
+    encodings = _preferred(ACCEPT_ENCODING)
+
+    def __init__(self,
+                 pool_connections=10,
+                 pool_maxsize=10,
+                 pool_block=False,
+                 keep_alive=True,
+                 thread_safe=False):
+        self.adapter = SparkAdapter(pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block,
+                                    keep_alive=keep_alive)
+        self.thread_safe = thread_safe
+        self._local = threading.local()
+        self._session = None if thread_safe else self._new_session()
+
+    def _new_session(self):
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+
+    @property
+    def session(self):
+        '''
+        The underlying :class:`requests.Session`. In thread safe mode each
+        thread's session is created on first use.
+        '''
+        if self._session is not None:
+            return self._session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    def request(self,
+                method,
+                url,
+                headers=None,
+                params=None,
+                data=None,
+                timeout=None,
+                stream=False,
+                **options):
+        # ie: files, allow_redirects, cookies or verify
+        return self.session.request(method,
+                                    url,
+                                    headers=headers,
+                                    params=params,
+                                    data=data,
+                                    timeout=timeout,
+                                    stream=stream,
+                                    **options)
+
+    def pool_stats(self):
+        return self.adapter.pool_stats()
+
+    def close(self):
+        self.adapter.close()
+        return
+
+    def __repr__(self):
+        return 'RequestsTransport'
+
+
+# -------------------------------------------------------------------! httpx
+class HttpxResponse(object):
+    ''' Adapts an :class:`httpx.Response` to the interface sparkpy uses '''
+
+    decoded_bytes = 0
+    _on_close = None
+
+    def __init__(self, response):
+        self._response = response
+        request = response.request
+        self.request = SimpleNamespace(method=request.method,
+                                       url=str(request.url),
+                                       headers=request.headers,
+                                       body=getattr(request, '_content',
+                                                    None))
+
+    @property
+    def status_code(self):
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def links(self):
+        return parse_links(self._response.headers.get('Link'))
+
+    @property
+    def wire_bytes(self):
+        return self._response.num_bytes_downloaded
+
+    @property
+    def content(self):
+        if not hasattr(self, '_content'):
+            self._content = self._response.read()
+            self.decoded_bytes = len(self._content)
+        return self._content
+
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        try:
+            return self._json
+        except AttributeError:
+            self._json = codec.loads(self.content)
+            return self._json
+
+    def iter_content(self, chunk_size=1024):
+        for chunk in self._response.iter_bytes(chunk_size):
+            self.decoded_bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        callback, self._on_close = self._on_close, None
+        if callback:
+            callback(self)
+        self._response.close()
+        return
+
+    def __repr__(self):
+        return f'<HttpxResponse [{self.status_code}]>'
+
+
+class HttpxTransport(SparkTransport):
+    '''
+    A transport built on :class:`httpx.Client`. With HTTP/2 every
+    concurrent request to the API is multiplexed over a single connection.
+
+    :param http2: (optional) Negotiate HTTP/2. Requires the `h2` package.
+                  Default: `True`
+    :type http2: bool
+    :param max_connections: (optional) Maximum open connections.
+                            Default: 100
+    :type max_connections: int
+    :param max_keepalive: (optional) Maximum idle connections kept.
+                          Default: 20
+    :type max_keepalive: int
+    :param keepalive_expiry: (optional) Seconds an idle connection is kept.
+                             Default: 30
+    :type keepalive_expiry: float
+
+    .. note:: :class:`httpx.Client` is safe to share between threads
+    '''
+
+    def __init__(self,
+                 http2=True,
+                 max_connections=100,
+                 max_keepalive=20,
+                 keepalive_expiry=30):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('HttpxTransport requires httpx, '
+                              'pip install httpx[http2]')
+        self._httpx = httpx
+        self.retry_errors = (httpx.TransportError,)
+        self.encodings = ('br', 'gzip', 'deflate') if _brotli() else \
+            ('gzip', 'deflate')
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive,
+                              keepalive_expiry=keepalive_expiry)
+        self.client = httpx.Client(http2=http2, limits=limits)
+
+    def request(self,
+                method,
+                url,
+                headers=None,
+                params=None,
+                data=None,
+                timeout=None,
+                stream=False,
+                **options):
+        if isinstance(timeout, tuple):
+            timeout = self._httpx.Timeout(timeout[1], connect=timeout[0])
+        if hasattr(data, 'read'):
+            # Stream file like bodies, ie: multipart uploads
+            data = iter(partial(data.read, 65536), b'')
+        # httpx names it follow_redirects, other options such as files or
+        # cookies are passed to the request
+        follow = options.pop('allow_redirects', None)
+        send = {} if follow is None else {'follow_redirects': follow}
+        request = self.client.build_request(method,
+                                            url,
+                                            headers=headers,
+                                            params=params,
+                                            content=data,
+                                            timeout=timeout,
+                                            **options)
+        return HttpxResponse(self.client.send(request, stream=stream, **send))
+
+    def close(self):
+        self.client.close()
+        return
+
+    def __repr__(self):
+        return 'HttpxTransport'
+
+
+# -----------------------------------------------------------------! in-memory
+class FakeRequest(object):
+    ''' A request as seen by an :class:`InMemoryTransport` handler '''
+
+    def __init__(self, method, url, headers, params, body, options=None):
+        parsed = urlparse(url)
+        self.method = method
+        self.path = parsed.path
+        self.params = dict(parse_qsl(parsed.query))
+        self.params.update({k: str(v) for k, v in (params or {}).items()})
+        query = urlencode(self.params)
+        self.url = f'{parsed.scheme}://{parsed.netloc}{parsed.path}' + \
+            (f'?{query}' if query else '')
+        self.headers = SparkHeaders(headers or {})
+        if hasattr(body, 'read'):
+            body = body.read()
+        if body and self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        self.body = body
+        # Any other transport options of the request
+        self.options = options or {}
+
+    def json(self):
+        return codec.loads(self.body)
+
+    def __repr__(self):
+        return f'<FakeRequest [{self.method} {self.url}]>'
+
+
+class FakeResponse(object):
+    '''
+    A response produced by an :class:`InMemoryTransport`. Bodies are gzip
+    compressed if the request accepted it and the handler set a
+    `Content-Encoding: gzip` header.
+    '''
+
+    _on_close = None
+
+    def __init__(self, request, status_code, body, headers=None):
+        self.request = request
+        self.status_code = status_code
+        self.headers = SparkHeaders(headers or {})
+        if body is None:
+            body = b''
+        elif not isinstance(body, bytes):
+            body = codec.dumps(body)
+        self.content = body
+        self.decoded_bytes = self.wire_bytes = len(body)
+        if self.headers.get('Content-Encoding') == 'gzip':
+            if 'gzip' in request.headers.get('Accept-Encoding', ''):
+                self.wire_bytes = len(gzip.compress(body))
+            else:
+                del self.headers['Content-Encoding']
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    @property
+    def links(self):
+        return parse_links(self.headers.get('Link'))
+
+    def json(self):
+        try:
+            return self._json
+        except AttributeError:
+            self._json = codec.loads(self.content)
+            return self._json
+
+    def iter_content(self, chunk_size=1024):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        callback, self._on_close = self._on_close, None
+        if callback:
+            callback(self)
+        return
+
+    def __repr__(self):
+        return f'<FakeResponse [{self.status_code}]>'
+
+
+class InMemoryTransport(SparkTransport):
+    '''
+    Serves requests from python callables without any network I/O
+
+    Handlers are registered per method and url path and receive a
+    :class:`FakeRequest`. They return the response body, or a
+    `(status, body)` or `(status, body, headers)` tuple. Bodies which are
+    not `bytes` are JSON encoded. Unrouted requests return a `404`.
+
+    Usage:
+        >>> transport = InMemoryTransport()
+        >>> transport.add('GET', '/v1/rooms', {'items': []})
+        >>> transport.add('POST', '/v1/messages',
+        ...               lambda request: (200, request.json()))
+        >>> spark = Spark('TOKEN', transport=transport)
+    '''
+
+    encodings = ('gzip',)
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def add(self, method, path, handler):
+        '''
+        Register a handler
+
+        :param method: The HTTP method
+        :param path: The url path, or a full url. Trailing slashes are
+                     ignored when matching
+        :param handler: A callable taking a :class:`FakeRequest`,
+                        or a static response
+        '''
+        path = urlparse(path).path.rstrip('/')
+        self.routes[(method.upper(), path)] = handler
+        return
+
+    def request(self,
+                method,
+                url,
+                headers=None,
+                params=None,
+                data=None,
+                timeout=None,
+                stream=False,
+                **options):
+        request = FakeRequest(method.upper(), url, headers, params, data,
+                              options)
+        with self._lock:
+            self.requests.append(request)
+        handler = self.routes.get((request.method,
+                                   request.path.rstrip('/')))
+        if handler is None:
+            return FakeResponse(request, 404, {'message': 'Not Found'})
+        result = handler(request) if callable(handler) else handler
+        if isinstance(result, tuple):
+            return FakeResponse(request, *result)
+        return FakeResponse(request, 200, result)
+
+    def __repr__(self):
+        return 'InMemoryTransport'
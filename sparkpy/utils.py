@@ -5,6 +5,7 @@ Utility functions that are used internally by sparkpy
 '''
 
 import base64
+from collections.abc import MutableMapping
 from urllib.parse import urlparse
 from uuid import UUID, uuid4
 
@@ -67,13 +68,12 @@ def decode_api_id(_id):
         :raises: `ValueError`
     '''
     if _id.startswith(magic_number):
-        __id = _id
-        url = urlparse(base64.b64decode(add_padding(_id))).decode()
-        uuid = url.path.split('/')[-1]
-        path = url.path.split('/')[1]
-        return {'uuid': uuid,
-                'path': api2url[path],
-                'id': __id}
+        # ciscospark://us/{PATH}/{uuid}
+        url = base64.b64decode(add_padding(_id)).decode()
+        parts = url.partition('://')[2].split('/')
+        return {'uuid': parts[-1],
+                'path': api2url[parts[1]],
+                'id': _id}
     else:
         raise ValueError('Invalid API ID')
 
@@ -136,3 +136,36 @@ def uuid_to_api_id(_id, path):
 def uuid_v4_str():
     ''' Returns a valid uuidv4 string'''
     return str(uuid4())
+
+
+# -------------! http helpers
+class SparkHeaders(MutableMapping):
+    '''
+    A case insensitive mapping of HTTP headers which keeps the case of the
+    most recently set key
+    '''
+
+    def __init__(self, headers=(), **kwargs):
+        self._store = {}
+        self.update(headers, **kwargs)
+
+    def __setitem__(self, key, value):
+        self._store[key.lower()] = (key, value)
+
+    def __getitem__(self, key):
+        return self._store[key.lower()][1]
+
+    def __delitem__(self, key):
+        del self._store[key.lower()]
+
+    def __iter__(self):
+        return (key for key, value in self._store.values())
+
+    def __len__(self):
+        return len(self._store)
+
+    def copy(self):
+        return SparkHeaders(self)
+
+    def __repr__(self):
+        return f'SparkHeaders({dict(self.items())})'
@@ -0,0 +1,63 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSparkServer(ThreadingHTTPServer):
+    '''
+    A local HTTP server standing in for the Cisco Spark API.
+
+    `routes` maps (method, path) to a callable taking the handler and
+    returning (status, body, headers). Unrouted requests get an empty page.
+    '''
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSparkHandler)
+        self.routes = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class FakeSparkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        path = self.path.split('?')[0]
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+        route = self.server.routes.get((self.command, path))
+        if route:
+            status, body, headers = route(self)
+        else:
+            status, body, headers = 200, {'items': []}, {}
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeSparkServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
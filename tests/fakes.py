@@ -0,0 +1,80 @@
+'''
+A fake Cisco Spark client shared by the test modules
+'''
+
+from sparkpy.retry import SparkRetryPolicy
+from sparkpy.session import SparkSession
+from sparkpy.transport import InMemoryTransport
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+
+API = 'https://api.ciscospark.com/v1/'
+
+
+class FakeSpark(object):
+    '''
+    A client stand-in whose session sends through an `InMemoryTransport`.
+    Requests are not retried so failures surface at once.
+    '''
+    is_bot = False
+    weak_parents = False
+
+    def __init__(self, transport=None, **session_kwargs):
+        self.transport = transport or InMemoryTransport()
+        session_kwargs.setdefault('retry', SparkRetryPolicy(max_attempts=1))
+        self.session = SparkSession('TOKEN', transport=self.transport,
+                                    **session_kwargs)
+
+    @property
+    def requests(self):
+        ''' `(method, url)` of every request sent '''
+        return [(request.method, request.url)
+                for request in self.transport.requests]
+
+    def serve(self, path, data, etag=None):
+        '''
+        Serve a resource at `API + path`. `GET` honours `If-None-Match`
+        when `etag` is set, `PUT` merges the body into `data`.
+        '''
+        state = {'data': data, 'etag': etag}
+
+        def get(request):
+            headers = {'ETag': state['etag']} if state['etag'] else {}
+            if state['etag'] and \
+                    request.headers.get('If-None-Match') == state['etag']:
+                return 304, b'', headers
+            return 200, state['data'], headers
+
+        def put(request):
+            state['data'] = dict(state['data'], **request.json())
+            return state['data']
+        self.transport.add('GET', API + path, get)
+        self.transport.add('PUT', API + path, put)
+        return state
+
+    def serve_pages(self, path, pages, fail_on=None):
+        '''
+        Serve a listing at `API + path` one page of items at a time,
+        following `Link` headers. Fetching the page numbered `state['fail_on']`
+        raises a `ConnectionError`.
+        '''
+        state = {'pages': pages, 'fail_on': fail_on}
+
+        def listing(request):
+            page = int(request.params.get('page', 0))
+            if page == state['fail_on']:
+                raise ConnectionError('Boom')
+            headers = {}
+            if page + 1 < len(state['pages']):
+                headers['Link'] = f'<{API}{path}?page={page + 1}>; rel="next"'
+            return 200, {'items': state['pages'][page]}, headers
+        self.transport.add('GET', API + path, listing)
+        return state
+
+
+def room_data(title='A room', **fields):
+    ''' The API data of a room '''
+    return dict({'id': uuid_to_api_id(uuid_v4_str(), 'rooms'),
+                 'title': title,
+                 'type': 'group',
+                 'created': '2017-08-26T12:01:36.373Z',
+                 'creatorId': 'PERSON'}, **fields)
@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from sparkpy.cache import SparkTTLCache, SparkQueryCache
+from sparkpy.models.container import SparkContainer
+from sparkpy.models.room import SparkRoom
+from sparkpy.session import SparkSession
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+from fakes import API, FakeSpark, room_data
+
+THREADS = 16
+
+
+def test_ttl_cache(monkeypatch):
+    from sparkpy import cache
+    clock = [0.0]
+    monkeypatch.setattr(cache, 'monotonic', lambda: clock[0])
+    lru = SparkTTLCache(maxsize=2, ttl=10)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    # b was the least recently used
+    assert 'b' not in lru
+    assert lru.get('a') == 1
+    clock[0] = 11
+    assert lru.get('a') is None
+    lru.set('d', 4, ttl=100)
+    assert lru.invalidate(lambda key: key == 'd') == 1
+    assert len(lru) == 1
+
+
+def slow_room(calls):
+    def route(handler):
+        calls.append(handler.path)
+        sleep(0.3)
+        return 200, {'id': 'ROOM', 'title': 'A room'}, {}
+    return route
+
+
+def test_single_flight(fake_server):
+    calls = []
+    fake_server.routes[('GET', '/v1/rooms/ROOM')] = slow_room(calls)
+    session = SparkSession('TOKEN', pool_maxsize=THREADS)
+    url = fake_server.url + '/v1/rooms/ROOM'
+    barrier = threading.Barrier(THREADS)
+
+    def worker(i):
+        barrier.wait()
+        return session.get(url).json()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(worker, range(THREADS)))
+    assert len(calls) == 1
+    assert session.flight.shared == THREADS - 1
+    assert all(result['title'] == 'A room' for result in results)
+
+
+def test_response_cache(fake_server):
+    calls = []
+    fake_server.routes[('GET', '/v1/rooms/ROOM')] = slow_room(calls)
+    session = SparkSession('TOKEN', response_cache_ttl=30)
+    url = fake_server.url + '/v1/rooms/ROOM'
+    for _ in range(5):
+        assert session.get(url).json()['title'] == 'A room'
+    assert len(calls) == 1
+    # Writes to the endpoint drop the cached responses
+    session.put(url, json={'title': 'Renamed'})
+    session.get(url)
+    assert len(calls) == 2
+    # Other endpoints don't
+    session.post(fake_server.url + '/v1/messages', json={})
+    session.get(url)
+    assert len(calls) == 2
+
+
+def test_query_cache_invalidate_url():
+    room_id = uuid_to_api_id(uuid_v4_str(), 'rooms')
+    cache = SparkQueryCache({'memberships': 60})
+    cache.set(('memberships', (('roomId', room_id),), None), [])
+    cache.set(('messages', (('roomId', room_id),), None), [])
+    cache.set(('messages', (('roomId', 'OTHER'),), None), [])
+    # Resources without a lifetime aren't cached
+    assert len(cache) == 1
+    cache.ttls['messages'] = 5
+    cache.set(('messages', (('roomId', room_id),), None), [])
+    cache.set(('messages', (('roomId', 'OTHER'),), None), [])
+    assert cache.invalidate_url(f'https://api.ciscospark.com/v1/rooms/{room_id}') == 2
+    assert len(cache) == 1
+
+
+def test_read_during_write_not_cached():
+    spark = FakeSpark(response_cache_ttl=60, query_cache_ttl=60)
+    room = room_data('old')
+    url = API + 'rooms/' + room['id']
+    spark.transport.add('GET', API + 'rooms',
+                        lambda request: {'items': [room]})
+    spark.transport.add('GET', url, lambda request: room)
+
+    def read():
+        spark.session.get(url)
+        list(SparkContainer(SparkRoom, parent=spark))
+
+    def put(request):
+        # Another thread reads the old state while the write is in flight
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join()
+        room.update(request.json())
+        return room
+    spark.transport.add('PUT', url, put)
+    spark.session.put(url, json={'title': 'new'})
+    assert spark.session.get(url).json()['title'] == 'new'
+    assert [item.title for item in
+            SparkContainer(SparkRoom, parent=spark)] == ['new']
@@ -0,0 +1,53 @@
+import json
+import pytest
+from sparkpy import codec
+from sparkpy.codec import iter_items
+
+ITEMS = [{'id': str(i), 'text': 'héllo ☃ ' * i, 'n': i} for i in range(100)]
+PAGE = json.dumps({'items': ITEMS}).encode('utf-8')
+
+
+def chunked(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, 4096, len(PAGE)])
+def test_iter_items(size):
+    assert list(iter_items(chunked(PAGE, size))) == ITEMS
+
+
+def test_iter_items_scalars():
+    assert list(iter_items(chunked(b'{"items": [1, 23, 456]}', 1))) == \
+        [1, 23, 456]
+    assert list(iter_items([b'{"items":[]}'])) == []
+
+
+def test_iter_items_lazy():
+    def chunks():
+        yield PAGE[:200]
+        raise AssertionError('Read past the first item')
+    assert next(iter_items(chunks())) == ITEMS[0]
+
+
+def test_iter_items_invalid():
+    with pytest.raises(ValueError):
+        list(iter_items([b'{"message": "Not Found"}']))
+    with pytest.raises(ValueError):
+        list(iter_items(chunked(PAGE[:-50], 64)))
+
+
+@pytest.mark.parametrize('name', codec.BACKENDS)
+def test_backends(name):
+    default = codec.backend
+    try:
+        codec.use(name)
+    except ImportError:
+        pytest.skip(f'{name} is not installed')
+    try:
+        data = codec.dumps({'items': ITEMS})
+        assert isinstance(data, bytes)
+        assert codec.loads(data) == {'items': ITEMS}
+        with pytest.raises(ValueError):
+            codec.loads(b'not json')
+    finally:
+        codec.use(default)
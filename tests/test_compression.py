@@ -0,0 +1,73 @@
+import gzip
+import json
+from sparkpy.session import SparkSession
+from sparkpy.transport import InMemoryTransport, _preferred
+
+MESSAGES = 'https://api.ciscospark.com/v1/messages'
+PAGE = {'items': [{'id': str(i), 'text': 'hello ' * 20} for i in range(100)]}
+
+
+def gzipped(handler):
+    body = json.dumps(PAGE).encode()
+    if 'gzip' in handler.headers.get('Accept-Encoding', ''):
+        return 200, gzip.compress(body), {'Content-Encoding': 'gzip'}
+    return 200, body, {}
+
+
+def test_gzip_response(fake_server):
+    fake_server.routes[('GET', '/v1/messages')] = gzipped
+    session = SparkSession('TOKEN')
+    assert 'gzip' in session.headers['Accept-Encoding']
+    assert session.get(fake_server.url + '/v1/messages').json() == PAGE
+    stats = session.transfer.snapshot()['messages']
+    assert stats['requests'] == 1
+    assert stats['received'] < stats['received_uncompressed']
+    assert stats['received_uncompressed'] == len(json.dumps(PAGE))
+
+
+def test_streamed_response_recorded_on_close(fake_server):
+    fake_server.routes[('GET', '/v1/messages')] = gzipped
+    session = SparkSession('TOKEN')
+    response = session.get(fake_server.url + '/v1/messages', stream=True)
+    assert session.transfer.snapshot() == {}
+    body = b''.join(response.iter_content(1024))
+    response.close()
+    stats = session.transfer.snapshot()['messages']
+    assert stats['received_uncompressed'] == len(body)
+    assert stats['received'] < len(body)
+
+
+def test_compression_disabled(fake_server):
+    fake_server.routes[('GET', '/v1/messages')] = gzipped
+    session = SparkSession('TOKEN', compression=False)
+    assert session.headers['Accept-Encoding'] == 'identity'
+    session.get(fake_server.url + '/v1/messages')
+    stats = session.transfer.totals()
+    assert stats['received'] == stats['received_uncompressed']
+
+
+def test_compressed_request_body():
+    transport = InMemoryTransport()
+    transport.add('POST', MESSAGES, lambda request: (200, request.json()))
+    session = SparkSession('TOKEN', transport=transport,
+                           compress_threshold=1024)
+    small = {'roomId': 'ROOM', 'text': 'hi'}
+    large = {'roomId': 'ROOM', 'markdown': 'hello ' * 1000}
+    assert session.post(MESSAGES, json=small).json() == small
+    assert session.post(MESSAGES, json=large).json() == large
+    assert 'Content-Encoding' not in transport.requests[0].headers
+    assert transport.requests[1].headers['Content-Encoding'] == 'gzip'
+    stats = session.transfer.snapshot()['messages']
+    assert stats['requests'] == 2
+    assert stats['sent'] < stats['sent_uncompressed']
+    assert stats['sent_uncompressed'] == \
+        len(json.dumps(small, separators=(',', ':'))) + \
+        len(json.dumps(large, separators=(',', ':')))
+
+
+def test_preferred_encodings():
+    assert _preferred('gzip,deflate') == ('gzip', 'deflate')
+    assert _preferred('deflate, gzip, zstd, br') == \
+        ('br', 'zstd', 'gzip', 'deflate')
+    # Codings it doesn't know are left out
+    assert _preferred('gzip,x-custom,deflate') == ('gzip', 'deflate')
@@ -0,0 +1,38 @@
+import time
+import pytest
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from sparkpy.retry import SparkRetryPolicy
+from sparkpy.session import SparkSession
+
+
+def test_pool_size(fake_server):
+    session = SparkSession('TOKEN', pool_maxsize=4, pool_block=True,
+                           coalesce=False)
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda i: session.get(fake_server.url + '/rooms'),
+                      range(64)))
+    stats = session.pool_stats()
+    host = fake_server.url.split('//')[1]
+    assert stats[host]['maxsize'] == 4
+    assert stats[host]['connections'] <= 4
+    assert stats[host]['requests'] == 64
+    assert stats[host]['in_use'] == 0
+    assert 1 <= stats[host]['idle'] <= 4
+
+
+def test_default_timeout(fake_server):
+    def slow(handler):
+        time.sleep(0.5)
+        return 200, {}, {}
+    fake_server.routes[('GET', '/slow')] = slow
+    session = SparkSession('TOKEN', timeout=(1, 0.1),
+                           retry=SparkRetryPolicy(max_attempts=1))
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session.get(fake_server.url + '/slow')
+
+
+def test_keep_alive_disabled(fake_server):
+    session = SparkSession('TOKEN', keep_alive=False)
+    assert session.headers['Connection'] == 'close'
+    session.get(fake_server.url + '/rooms')
@@ -0,0 +1,297 @@
+import pytest
+import tracemalloc
+from sparkpy.models.container import SparkContainer
+from sparkpy.models.room import SparkRoom
+from sparkpy.transport import InMemoryTransport
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+from fakes import FakeSpark, room_data
+
+ROOMS = 'https://api.ciscospark.com/v1/rooms'
+
+
+def rooms(total):
+    '''
+    A transport serving `total` rooms, paged by `max` with a cursor.
+    The listing is `transport.rooms`
+    '''
+    data = [room_data(f'Room {i}') for i in range(total)]
+    transport = InMemoryTransport()
+    transport.rooms = data
+
+    def listing(request):
+        per_page = int(request.params['max'])
+        start = int(request.params.get('cursor', 0))
+        headers = {}
+        if start + per_page < len(data):
+            headers['Link'] = (f'<{ROOMS}?max={per_page}&cursor='
+                               f'{start + per_page}>; rel="next"')
+        return 200, {'items': data[start:start + per_page]}, headers
+
+    transport.add('GET', ROOMS, listing)
+    return transport
+
+
+def container(transport, per_page=10):
+    return SparkContainer(SparkRoom, parent=FakeSpark(transport),
+                          per_page=per_page)
+
+
+def test_iteration():
+    transport = rooms(25)
+    titles = [item.title for item in container(transport)]
+    assert titles == [f'Room {i}' for i in range(25)]
+    assert len(transport.requests) == 3
+
+
+def test_index_fetches_needed_pages():
+    transport = rooms(100)
+    items = container(transport)
+    assert items[15].title == 'Room 15'
+    assert len(transport.requests) == 2
+    # Already loaded pages are served from memory
+    assert items[3].title == 'Room 3'
+    assert len(transport.requests) == 2
+    assert [page[0] for page in items.pages] == [0, 10, 20]
+    with pytest.raises(IndexError):
+        container(rooms(5))[5]
+
+
+def test_slices():
+    transport = rooms(100)
+    items = container(transport)
+    assert [item.title for item in items[12:15]] == \
+        ['Room 12', 'Room 13', 'Room 14']
+    assert len(transport.requests) == 2
+    assert [item.title for item in items[0:30:10]] == \
+        ['Room 0', 'Room 10', 'Room 20']
+    assert len(transport.requests) == 3
+    assert not items.loaded
+
+
+def test_negative_index_and_reversed():
+    transport = rooms(25)
+    items = container(transport)
+    assert items[-1].title == 'Room 24'
+    assert [item.title for item in items[-2:]] == ['Room 23', 'Room 24']
+    assert [item.title for item in reversed(items)][:2] == \
+        ['Room 24', 'Room 23']
+    assert len(items) == 25
+    # Every page was fetched exactly once
+    assert len(transport.requests) == 3
+
+
+def test_params_not_shared():
+    params = {'teamId': 'TEAM'}
+    transport = rooms(5)
+    spark = FakeSpark(transport)
+    SparkContainer(SparkRoom, params=params, parent=spark)
+    assert params == {'teamId': 'TEAM'}
+
+
+def test_shared_page_boundaries():
+    transport = rooms(100)
+    spark = FakeSpark(transport, container_ttl=300)
+    first = SparkContainer(SparkRoom, parent=spark, per_page=10)
+    assert len(first) == 100
+    assert len(transport.requests) == 10
+    # Another container over the same query knows the count and cursors
+    second = SparkContainer(SparkRoom, parent=spark, per_page=10)
+    assert len(second) == 100
+    assert second.__length_hint__() == 100
+    assert len(transport.requests) == 10
+    assert second[95].title == 'Room 95'
+    assert transport.requests[-1].params['cursor'] == '90'
+    assert len(transport.requests) == 11
+    # A different query doesn't share them
+    other = SparkContainer(SparkRoom, parent=spark, per_page=20)
+    assert other.__length_hint__() == 0
+    assert other[0].title == 'Room 0'
+    assert other.__length_hint__() == 20
+    assert len(transport.requests) == 12
+
+
+def test_writes_drop_page_boundaries():
+    transport = rooms(30)
+    transport.add('POST', ROOMS, room_data('Room 30'))
+    spark = FakeSpark(transport, container_ttl=300)
+    assert len(SparkContainer(SparkRoom, parent=spark, per_page=10)) == 30
+    spark.session.post(ROOMS, json={'title': 'Room 30'})
+    assert len(spark.session.container_metadata) == 0
+
+
+def test_stale_total():
+    transport = rooms(30)
+    spark = FakeSpark(transport, container_ttl=300)
+    assert len(SparkContainer(SparkRoom, parent=spark, per_page=10)) == 30
+    # The listing shrinks without a write through this session
+    del transport.rooms[15:]
+    items = SparkContainer(SparkRoom, parent=spark, per_page=10)
+    assert items[-1].title == 'Room 14'
+    assert len(items) == 15
+    del transport.rooms[5:]
+    items = SparkContainer(SparkRoom, parent=spark, per_page=10)
+    assert [item.title for item in reversed(items)] == \
+        [f'Room {i}' for i in range(4, -1, -1)]
+    assert len(items) == 5
+
+
+def test_query_cache():
+    transport = rooms(15)
+    transport.add('POST', ROOMS, room_data('Room 15'))
+    spark = FakeSpark(transport, query_cache_ttl={'rooms': 60})
+    session = spark.session
+    assert len(SparkContainer(SparkRoom, parent=spark, per_page=10)) == 15
+    assert len(transport.requests) == 2
+    titles = [item.title for item in
+              SparkContainer(SparkRoom, parent=spark, per_page=10)]
+    assert titles == [f'Room {i}' for i in range(15)]
+    assert len(transport.requests) == 2
+    # Writes to the resource drop its listings
+    session.post(ROOMS, json={'title': 'Room 15'})
+    list(SparkContainer(SparkRoom, parent=spark, per_page=10))
+    assert len(transport.requests) == 5
+
+
+def test_lazy_queries():
+    transport = rooms(100)
+    items = container(transport)
+    assert len(transport.requests) == 0
+    query = items.where(type='group', teamId=None).order_by('created')
+    latest = query.limit(5)
+    assert len(transport.requests) == 0
+    assert [item.title for item in latest] == \
+        [f'Room {i}' for i in range(5)]
+    assert len(latest) == 5
+    assert len(transport.requests) == 1
+    assert transport.requests[0].params == \
+        {'max': '5', 'type': 'group', 'sortBy': 'created'}
+    # Limits spanning pages stop at the limit
+    spanning = items.limit(25)
+    assert [item.title for item in reversed(spanning)][0] == 'Room 24'
+    assert len(spanning) == 25
+    assert len(transport.requests) == 4
+    assert len(items.limit(500)) == 100
+
+
+def test_flat_map():
+    transport = rooms(30)
+    spark = FakeSpark(transport)
+    rooms_ = list(SparkContainer(SparkRoom, parent=spark, per_page=10))
+    failing = rooms_[7].id
+
+    def members(request):
+        room_id = request.params['roomId']
+        if room_id == failing:
+            return 403, {'message': 'Forbidden'}
+        return {'items': [{'id': uuid_to_api_id(uuid_v4_str(), 'memberships'),
+                           'roomId': room_id,
+                           'personId': 'PERSON',
+                           'personEmail': f'{i}@example.com',
+                           'personOrgId': 'ORG',
+                           'personDisplayName': f'Person {i}',
+                           'isModerator': False,
+                           'created': '2017-08-26T12:01:36.373Z'}
+                          for i in range(3)]}
+
+    transport.add('GET', 'https://api.ciscospark.com/v1/memberships',
+                  members)
+    container = SparkContainer(SparkRoom, parent=spark, per_page=10)
+    results = list(container.flat_map('members', concurrency=4,
+                                      ordered=True))
+    assert len(results) == 29 * 3 + 1
+    assert [room.id for room, _ in results[::3][:7]] == \
+        [room.id for room in rooms_[:7]]
+    errors = [(room, error) for room, error in results
+              if isinstance(error, Exception)]
+    assert len(errors) == 1 and errors[0][0].id == failing
+    # Unordered yields the same pairs as listings complete
+    unordered = list(container.flat_map('members', concurrency=4))
+    assert sorted(member.personEmail + room.id for room, member in unordered
+                  if not isinstance(member, Exception)) == \
+        sorted(member.personEmail + room.id for room, member in results
+               if not isinstance(member, Exception))
+
+
+def test_index_by():
+    transport = rooms(30)
+    items = container(transport)
+    assert items[0].title == 'Room 0'
+    by_title = items.index_by('title')
+    # Loaded pages are indexed without requests
+    assert by_title['Room 5'].title == 'Room 5'
+    assert len(transport.requests) == 1
+    # Unseen values load pages until found
+    assert 'Room 12' in by_title
+    assert len(transport.requests) == 2
+    assert 'Missing' not in by_title
+    assert len(transport.requests) == 3
+    assert [item.title for item in by_title.get_all('Room 29')] == ['Room 29']
+    assert len(by_title) == 30
+    assert len(transport.requests) == 3
+    assert items.index_by('title') is by_title
+    assert len(container(transport).limit(15).index_by('title')) == 15
+
+
+def test_to_columns():
+    transport = rooms(25)
+    items = container(transport)
+    columns = items.to_columns(['title', 'created', 'teamId'])
+    assert list(columns) == ['title', 'created', 'teamId']
+    assert columns['title'] == [f'Room {i}' for i in range(25)]
+    assert columns['teamId'] == [None] * 25
+    assert len(transport.requests) == 3
+    assert set(items.to_columns()) == set(SparkRoom.PROPERTIES)
+    assert items.limit(12).to_columns(['title'])['title'][-1] == 'Room 11'
+
+
+def test_to_numpy():
+    numpy = pytest.importorskip('numpy')
+    arrays = container(rooms(5)).to_numpy(['title', 'created'])
+    assert arrays['created'].dtype == numpy.dtype('datetime64[ns]')
+    assert str(arrays['created'][0]) == '2017-08-26T12:01:36.373000000'
+    assert arrays['title'].dtype == object
+
+
+def _peak_memory(items, iterate):
+    tracemalloc.start()
+    try:
+        for item in iterate(items):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_forward_memory_bounded():
+    def listing(total):
+        return container(rooms(total), per_page=100)
+    small = _peak_memory(listing(500), lambda items: items.forward())
+    large = _peak_memory(listing(5000), lambda items: items.forward())
+    # Peak memory doesn't grow with the listing
+    assert large < small * 1.5
+    # Plain iteration keeps every page
+    assert _peak_memory(listing(5000), iter) > large * 4
+
+
+def test_forward_window():
+    transport = rooms(50)
+    items = container(transport)
+    titles = []
+    for item in items.forward(window=2):
+        titles.append(item.title)
+        assert len(items._pages) <= 2
+    assert titles == [f'Room {i}' for i in range(50)]
+    # Released pages are fetched again
+    assert items[0].title == 'Room 0'
+    assert len(transport.requests) == 6
+
+
+def test_forward_bypasses_query_cache():
+    transport = rooms(50)
+    spark = FakeSpark(transport, query_cache_ttl=60)
+    items = SparkContainer(SparkRoom, parent=spark, per_page=10)
+    titles = [item.title for item in items.forward()]
+    assert titles == [f'Room {i}' for i in range(50)]
+    # Released pages aren't held on to by the query cache
+    assert len(spark.session.query_cache) == 0
+    assert len(transport.requests) == 5
@@ -0,0 +1,83 @@
+import gzip
+import json
+import multiprocessing
+import pytest
+import sparkpy.spark
+from sparkpy.export import SparkExporter, export_rooms
+from sparkpy.models.room import SparkRoom
+from sparkpy.utils import api_id_to_uuid, uuid_to_api_id, uuid_v4_str
+from fakes import FakeSpark
+
+PAGES = 5
+PER_PAGE = 3
+ROOM_ID = uuid_to_api_id(uuid_v4_str(), 'rooms')
+
+
+def message_pages():
+    return [[{'id': f'{page}-{i}', 'roomId': ROOM_ID, 'text': 'hello',
+              'files': [f'file-{i}'], 'created': '2017-08-26T12:01:36.373Z'}
+             for i in range(PER_PAGE)]
+            for page in range(PAGES)]
+
+
+def exported_room(fail_on=None):
+    spark = FakeSpark()
+    spark.serve_pages('messages', message_pages(), fail_on=fail_on)
+    return SparkRoom(ROOM_ID, parent=spark)
+
+
+def read_ids(path):
+    with gzip.open(path, 'rt') as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def test_export_jsonl(tmp_path):
+    path = str(tmp_path / 'room.jsonl.gz')
+    assert SparkExporter(exported_room(), path).run() == 15
+    assert len(read_ids(path)) == 15
+
+
+def test_export_resume(tmp_path):
+    path = str(tmp_path / 'room.jsonl.gz')
+    with pytest.raises(ConnectionError):
+        SparkExporter(exported_room(fail_on=3), path).run()
+    assert len(read_ids(path)) == 9
+    room = exported_room()
+    assert SparkExporter(room, path).run() == 15
+    # Only the remaining pages are fetched
+    assert len(room.root.requests) == 2
+    ids = read_ids(path)
+    assert len(ids) == len(set(ids)) == 15
+    # A completed export is a no-op
+    assert SparkExporter(room, path).run() == 15
+    assert len(room.root.requests) == 2
+
+
+def test_export_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    from pyarrow import parquet
+    path = str(tmp_path / 'room_parquet')
+    exporter = SparkExporter(exported_room(), path,
+                             fmt='parquet', pages_per_part=2)
+    assert exporter.run() == 15
+    parts = sorted((tmp_path / 'room_parquet').iterdir())
+    assert len(parts) == 3
+    table = parquet.read_table(str(tmp_path / 'room_parquet'))
+    assert table.num_rows == 15
+    assert table.column('files').to_pylist()[0] == ['file-0']
+
+
+def test_export_rooms(tmp_path, monkeypatch):
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip('Workers must be forked to see the fake client')
+
+    def spark(token):
+        client = FakeSpark()
+        client.serve_pages('messages', message_pages())
+        return client
+    monkeypatch.setattr(sparkpy.spark, 'Spark', spark)
+    results = export_rooms([ROOM_ID], str(tmp_path), token='TOKEN',
+                           processes=1)
+    assert results == {ROOM_ID: 15}
+    path = tmp_path / (api_id_to_uuid(ROOM_ID) + '.jsonl.gz')
+    assert len(read_ids(str(path))) == 15
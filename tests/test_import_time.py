@@ -0,0 +1,49 @@
+import os
+import sys
+import subprocess
+import sparkpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(sparkpy.__file__)))
+# Generous, this catches heavy dependencies creeping back into the import
+# path rather than measuring precisely
+BUDGET_US = 500000
+
+
+def import_times(code):
+    '''
+    Run `code` in a fresh interpreter with `-X importtime`
+
+    :return: Mapping of module name to cumulative import time in us
+    '''
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            env=env, capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_is_lazy():
+    times = import_times('import sparkpy')
+    assert [name for name in times if name.startswith('sparkpy.')] == []
+    assert times['sparkpy'] < BUDGET_US
+
+
+def test_client_without_requests():
+    times = import_times('import sparkpy; sparkpy.Spark("TOKEN")')
+    assert 'sparkpy.models.room' not in times
+    assert 'requests' not in times
+    assert 'requests_toolbelt' not in times
+    assert sum(times[name] for name in times
+               if name.startswith('sparkpy')) < BUDGET_US
+
+
+def test_session_imports_transport_on_first_use():
+    times = import_times('import sparkpy; sparkpy.Spark("TOKEN").session')
+    assert 'requests' in times
+    assert 'requests_toolbelt' not in times
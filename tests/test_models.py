@@ -0,0 +1,290 @@
+import gc
+import pytest
+from sparkpy.exceptions.spark_exceptions import SparkAPIException
+from sparkpy.models import base
+from sparkpy.models.people import SparkPerson
+from sparkpy.models.room import SparkRoom
+from sparkpy.models.team import SparkTeam
+from sparkpy.models.webhook import SparkWebhook
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+from fakes import FakeSpark
+
+PERSON_ID = 'Y2lzY29zcGFyazovL3VzL1BFT1BMRS9mNWIzNjE4Ny1jOGRkLTQ3MjctOGIyZi1mOWM0NDdmMjkwNDY'
+ROOM_ID = 'Y2lzY29zcGFyazovL3VzL1JPT00vYmJjZWIxYWQtNDNmMS0zYjU4LTkxNDctZjE0YmIwYzRkMTU0'
+
+
+def person_data():
+    return {'id': PERSON_ID,
+            'emails': ['panholt@gmail.com'],
+            'displayName': 'Paul',
+            'orgId': 'ORG',
+            'created': '2017-08-26T12:01:36.373Z',
+            'type': 'person'}
+
+
+def room_data():
+    return {'id': ROOM_ID, 'title': 'Room', 'type': 'group',
+            'created': '2017-08-26T12:01:36.373Z', 'creatorId': PERSON_ID}
+
+
+def membership_data(**fields):
+    return dict({'id': uuid_to_api_id(uuid_v4_str(), 'memberships'),
+                 'personId': PERSON_ID,
+                 'personEmail': 'panholt@gmail.com',
+                 'personOrgId': 'ORG',
+                 'personDisplayName': 'Paul',
+                 'isModerator': False,
+                 'created': '2017-08-26T12:01:36.373Z'}, **fields)
+
+
+def person_spark(data=None):
+    ''' A fake client serving the person with an ETag '''
+    spark = FakeSpark()
+    spark.serve(f'people/{PERSON_ID}', data or person_data(), etag='"v1"')
+    return spark
+
+
+def test_batch_update_single_put():
+    spark = person_spark()
+    person = SparkPerson(parent=spark, **person_data())
+    with person.batch_update():
+        person.displayName = 'Paul Anholt'
+        person.firstName = 'Paul'
+        person.lastName = 'Anholt'
+        assert person.dirty == {'displayName': 'Paul Anholt',
+                                'firstName': 'Paul',
+                                'lastName': 'Anholt'}
+    assert [method for method, url in spark.requests] == ['PUT']
+    payload = spark.transport.requests[0].json()
+    assert payload['emails'] == ['panholt@gmail.com']
+    assert payload['lastName'] == 'Anholt'
+    assert person.dirty == {}
+    assert person.lastName == 'Anholt'
+
+
+def test_batch_update_rollback():
+    spark = person_spark()
+    person = SparkPerson(parent=spark, **person_data())
+    with pytest.raises(RuntimeError):
+        with person.batch_update():
+            person.displayName = 'Someone else'
+            raise RuntimeError
+    assert spark.requests == []
+    assert person.displayName == 'Paul'
+    assert person.dirty == {}
+
+
+def test_failed_update():
+    spark = person_spark()
+    spark.transport.add('PUT', f'https://api.ciscospark.com/v1/people/'
+                        f'{PERSON_ID}', (400, {'message': 'Bad request'}))
+    person = SparkPerson(parent=spark, **person_data())
+    with pytest.raises(SparkAPIException):
+        with person.batch_update():
+            person.displayName = 'Paul Anholt'
+            # A failed save keeps the changes pending
+            with pytest.raises(SparkAPIException):
+                person.save()
+            assert person.dirty == {'displayName': 'Paul Anholt'}
+    # Failing on exit rolls back like the block raising
+    assert person.dirty == {}
+    assert person.displayName == 'Paul'
+    with pytest.raises(SparkAPIException):
+        person.displayName = 'Paul Anholt'
+    assert person.displayName == 'Paul'
+
+
+def test_webhook_update_unloaded():
+    webhook_id = uuid_to_api_id(uuid_v4_str(), 'webhooks')
+    data = {'id': webhook_id, 'name': 'Hook', 'targetUrl': 'https://a/',
+            'event': 'all', 'resource': 'all'}
+    spark = FakeSpark()
+    spark.serve(f'webhooks/{webhook_id}', data)
+    webhook = SparkWebhook(webhook_id, parent=spark)
+    # Given both properties, the webhook isn't loaded to fill them in
+    webhook.update(name='New', targetUrl='https://b/')
+    assert spark.requests == [('PUT', webhook.url)]
+    assert spark.transport.requests[0].json() == {'name': 'New',
+                                                  'targetUrl': 'https://b/'}
+    assert webhook.name == 'New'
+
+
+def test_unloaded_fetches_once():
+    spark = person_spark()
+    person = SparkPerson(PERSON_ID, parent=spark)
+    person.nickName = 'P'
+    assert [method for method, url in spark.requests] == ['GET', 'PUT']
+    with pytest.raises(AttributeError):
+        person.orgId = 'OTHER'
+
+
+def test_room_single_assignment():
+    data = dict(room_data(), title='old')
+    spark = FakeSpark()
+    spark.serve(f'rooms/{ROOM_ID}', data)
+    room = SparkRoom(parent=spark, **data)
+    room.title = 'new'
+    assert spark.requests == [('PUT', room.url)]
+    assert spark.transport.requests[0].json() == {'title': 'new'}
+    assert room.title == 'new'
+
+
+def test_refresh_off_by_default(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(base, 'monotonic', lambda: clock[0])
+    spark = FakeSpark()
+    spark.serve(f'people/{PERSON_ID}', person_data(), etag='"v1"')
+    person = SparkPerson(PERSON_ID, parent=spark)
+    assert person.displayName == 'Paul'
+    clock[0] += 86400
+    assert not person.stale
+    assert person.displayName == 'Paul'
+    assert len(spark.requests) == 1
+
+
+def test_conditional_refresh(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(base, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(SparkPerson, 'REFRESH_TTL', 900)
+    spark = FakeSpark()
+    served = spark.serve(f'people/{PERSON_ID}', person_data(), etag='"v1"')
+    person = SparkPerson(PERSON_ID, parent=spark)
+    assert person.displayName == 'Paul'
+    loaded_at = person.loaded_at
+    assert not person.stale
+    # Within the TTL no requests are made
+    clock[0] += SparkPerson.REFRESH_TTL - 1
+    assert person.displayName == 'Paul'
+    assert len(spark.requests) == 1
+    # Unchanged after the TTL, revalidated with a 304
+    clock[0] += 2
+    assert person.stale
+    assert person.displayName == 'Paul'
+    assert spark.transport.requests[-1].headers['If-None-Match'] == '"v1"'
+    assert person.loaded_at is not loaded_at
+    assert not person.stale
+    # Changed after the TTL, reloaded
+    served['data'] = dict(person_data(), displayName='Paul Anholt')
+    served['etag'] = '"v2"'
+    clock[0] += SparkPerson.REFRESH_TTL + 1
+    assert person.displayName == 'Paul Anholt'
+    assert len(spark.requests) == 3
+
+
+def test_schema_compiled():
+    schema = SparkPerson._schema
+    assert schema.known == frozenset(SparkPerson.PROPERTIES)
+    assert 'id' in schema.required and 'nickName' not in schema.required
+    person = SparkPerson(parent=FakeSpark(), **person_data())
+    assert person.loaded
+    assert person.created.ts == '2017-08-26T12:01:36.373Z'
+    assert person.nickName is None
+
+
+def test_unknown_fields_rate_limited(monkeypatch, caplog):
+    clock = [1000.0]
+    monkeypatch.setattr(base, 'monotonic', lambda: clock[0])
+    SparkPerson._schema._unknown.clear()
+    data = dict(person_data(), surprise=True)
+    for _ in range(5):
+        SparkPerson(parent=FakeSpark(), **data)
+    warnings = [record for record in caplog.records
+                if 'surprise' in record.getMessage()]
+    assert len(warnings) == 1
+    clock[0] += base.UNKNOWN_FIELD_INTERVAL
+    SparkPerson(parent=FakeSpark(), **data)
+    warnings = [record.getMessage() for record in caplog.records
+                if 'surprise' in record.getMessage()]
+    assert len(warnings) == 2
+    assert '4 more since last warned' in warnings[1]
+
+
+def test_root_resolved_once():
+    spark = FakeSpark()
+    room = SparkRoom(parent=spark, **room_data())
+    members = room.members
+    assert members.root is spark and members.session is spark.session
+    person = SparkPerson(parent=room, **person_data())
+    assert person.root is spark
+    assert person.parent is room
+    # Items of a container are handed its root
+    assert base.root_of(members) is spark
+    assert SparkPerson(parent=members, root=spark, **person_data()).root \
+        is spark
+
+
+def test_weak_parents():
+    spark = FakeSpark()
+    spark.weak_parents = True
+    room = SparkRoom(parent=spark, **room_data())
+    person = SparkPerson(parent=room, **person_data())
+    assert person.parent is room
+    # The client itself is held strongly
+    assert room.parent is spark
+    del room
+    gc.collect()
+    assert person.parent is False
+    assert person.session is spark.session
+
+
+def test_room_remove_member():
+    url = 'https://api.ciscospark.com/v1/memberships'
+    spark = FakeSpark()
+    member = membership_data(roomId=ROOM_ID)
+    spark.transport.add('GET', url, {'items': [member]})
+    spark.transport.add('DELETE', f'{url}/{member["id"]}', (204, b''))
+    room = SparkRoom(parent=spark, **room_data())
+    room.remove_member(email='panholt@gmail.com')
+    room.remove_member(PERSON_ID)
+    assert [method for method, url in spark.requests] == \
+        ['GET', 'DELETE', 'GET', 'DELETE']
+    # A single filtered listing request each
+    by_email, by_id = spark.transport.requests[0], spark.transport.requests[2]
+    assert by_email.params['roomId'] == by_id.params['roomId'] == ROOM_ID
+    assert by_email.params['personEmail'] == 'panholt@gmail.com'
+    assert by_id.params['personId'] == PERSON_ID
+
+
+def test_team_remove_member():
+    url = 'https://api.ciscospark.com/v1/team/memberships'
+    spark = FakeSpark()
+    team = SparkTeam(parent=spark, id=uuid_to_api_id(uuid_v4_str(), 'teams'),
+                     name='Team', creatorId=PERSON_ID,
+                     created='2017-08-26T12:01:36.373Z')
+    member = membership_data(
+        id=uuid_to_api_id(uuid_v4_str(), 'team/memberships'), teamId=team.id)
+    other = membership_data(teamId=team.id, personId='OTHER',
+                            personEmail='someone@example.com')
+    spark.transport.add('GET', url, {'items': [other, member]})
+    spark.transport.add('DELETE', f'{url}/{member["id"]}', (204, b''))
+    team.remove_member(email='panholt@gmail.com')
+    team.remove_member(PERSON_ID)
+    assert [(method, url.split('?')[0].rstrip('/'))
+            for method, url in spark.requests] == \
+        [('GET', url), ('DELETE', f'{url}/{member["id"]}'), ('GET', url),
+         ('DELETE', f'{url}/{member["id"]}')]
+
+
+def test_team_remove_member_indexed():
+    url = 'https://api.ciscospark.com/v1/team/memberships'
+    spark = FakeSpark()
+    team = SparkTeam(parent=spark, id=uuid_to_api_id(uuid_v4_str(), 'teams'),
+                     name='Team', creatorId=PERSON_ID,
+                     created='2017-08-26T12:01:36.373Z')
+    members = [membership_data(
+        id=uuid_to_api_id(uuid_v4_str(), 'team/memberships'),
+        teamId=team.id, personId=f'PERSON{n}',
+        personEmail=f'person{n}@example.com') for n in range(5)]
+    spark.transport.add('GET', url, {'items': members})
+    for member in members:
+        spark.transport.add('DELETE', f'{url}/{member["id"]}', (204, b''))
+    team.remove_member('PERSON0')
+    team.remove_member(email='person1@example.com')
+    team.remove_member('PERSON2')
+    # One listing serves every lookup
+    assert [method for method, _ in spark.requests].count('GET') == 1
+    # A member already removed isn't found in the kept listing, which is
+    # reloaded once in case they rejoined
+    team.remove_member(email='person0@example.com')
+    assert [method for method, _ in spark.requests] == \
+        ['GET'] + ['DELETE'] * 3 + ['GET', 'DELETE']
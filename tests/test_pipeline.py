@@ -0,0 +1,86 @@
+import threading
+import pytest
+from time import sleep
+from concurrent.futures import CancelledError
+from sparkpy import Spark
+from sparkpy.exceptions import SparkAPIException
+from sparkpy.models.room import SparkRoom
+from sparkpy.transport import InMemoryTransport
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+
+ROOMS = 'https://api.ciscospark.com/v1/rooms'
+
+
+def room(room_id=None, title='A room'):
+    return {'id': room_id or uuid_to_api_id(uuid_v4_str(), 'rooms'),
+            'title': title,
+            'type': 'group',
+            'created': '2017-08-26T12:01:36.373Z',
+            'creatorId': 'PERSON'}
+
+
+def client(transport):
+    return Spark('TOKEN', transport=transport, thread_safe=True)
+
+
+def test_pipeline_ordered_results():
+    transport = InMemoryTransport()
+    state = {'active': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def handler(room_id):
+        def get(request):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            sleep(0.01)
+            with lock:
+                state['active'] -= 1
+            return room(room_id, title=room_id[-6:])
+        return get
+
+    room_ids = [uuid_to_api_id(uuid_v4_str(), 'rooms') for _ in range(30)]
+    for room_id in room_ids[:-1]:
+        transport.add('GET', f'{ROOMS}/{room_id}', handler(room_id))
+    transport.add('POST', ROOMS, lambda request: room(**request.json()))
+    spark = client(transport)
+
+    with spark.pipeline(max_workers=4) as pipeline:
+        futures = [pipeline.load(SparkRoom(room_id, parent=spark))
+                   for room_id in room_ids]
+        created = pipeline.spark.create_room('Launch')
+        assert not futures[0].done()
+
+    assert state['peak'] <= 4
+    assert len(pipeline.results) == 31
+    for room_id, result in zip(room_ids[:-1], pipeline.results):
+        assert result.title == room_id[-6:]
+    # The missing room failed on its own
+    assert isinstance(pipeline.results[29], SparkAPIException)
+    with pytest.raises(SparkAPIException):
+        futures[29].result()
+    assert created.result().title == 'Launch'
+
+
+def test_pipeline_cancelled_on_error():
+    spark = client(InMemoryTransport())
+    with pytest.raises(RuntimeError):
+        with spark.pipeline() as pipeline:
+            future = pipeline.get(ROOMS)
+            raise RuntimeError('Boom')
+    assert future.cancelled()
+    with pytest.raises(CancelledError):
+        future.result()
+
+
+def test_pipeline_base_exception():
+    def interrupted():
+        raise KeyboardInterrupt
+    spark = client(InMemoryTransport())
+    pipeline = spark.pipeline()
+    future = pipeline.submit(interrupted)
+    other = pipeline.submit(lambda: 'done')
+    with pytest.raises(KeyboardInterrupt):
+        pipeline.execute()
+    assert isinstance(future.exception(timeout=1), KeyboardInterrupt)
+    assert other.result(timeout=1) == 'done'
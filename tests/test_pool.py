@@ -0,0 +1,110 @@
+import threading
+from sparkpy.models.container import SparkContainer
+from sparkpy.models.room import SparkRoom
+from sparkpy.pool import SparkPool
+from sparkpy.transport import InMemoryTransport
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+from fakes import room_data
+
+API = 'https://api.ciscospark.com/v1/'
+ROOM = uuid_to_api_id(uuid_v4_str(), 'rooms')
+
+
+def token(request):
+    return request.headers['Authorization'].split()[-1]
+
+
+def pool(transport, tokens=('A', 'B')):
+    return SparkPool(list(tokens), transport=transport)
+
+
+def test_reads_are_balanced():
+    transport = InMemoryTransport()
+    transport.add('GET', API + 'people', {'items': []})
+    spark = pool(transport)
+    for _ in range(20):
+        spark.session.get(API + 'people')
+    stats = spark.session.utilization()
+    assert stats['token0']['requests'] == stats['token1']['requests'] == 10
+    assert stats['token0']['in_flight'] == 0
+
+
+def test_rate_limited_failover():
+    transport = InMemoryTransport()
+
+    def people(request):
+        if token(request) == 'A':
+            return 429, {}, {'Retry-After': '30'}
+        return {'items': []}
+
+    transport.add('GET', API + 'people', people)
+    spark = pool(transport)
+    assert spark.session.get(API + 'people').status_code == 200
+    assert spark.session.get(API + 'people').status_code == 200
+    stats = spark.session.utilization()
+    assert stats['token0']['rate_limited'] == 1
+    assert stats['token0']['failovers'] == 1
+    assert stats['token0']['backoff'] > 0
+    # Token A is skipped while it backs off
+    assert stats['token0']['requests'] == 1
+    assert stats['token1']['requests'] == 2
+
+
+def test_unauthorized_token_disabled():
+    transport = InMemoryTransport()
+
+    def people(request):
+        if token(request) == 'B':
+            return 401, {'message': 'Unauthorized'}
+        return {'items': []}
+
+    transport.add('GET', API + 'people', people)
+    spark = pool(transport, tokens=('B', 'A'))
+    for _ in range(4):
+        assert spark.session.get(API + 'people').status_code == 200
+    stats = spark.session.utilization()
+    assert stats['token0']['disabled']
+    assert stats['token0']['requests'] == 1
+
+
+def test_writes_use_a_member_token():
+    transport = InMemoryTransport()
+    transport.add('GET', API + 'rooms/' + ROOM,
+                  lambda request: (200 if token(request) == 'B' else 404, {}))
+    transport.add('POST', API + 'messages',
+                  lambda request: {'sender': token(request)})
+    spark = pool(transport)
+    for text in ('one', 'two', 'three'):
+        response = spark.session.post(API + 'messages',
+                                      json={'roomId': ROOM, 'text': text})
+        assert response.json() == {'sender': 'B'}
+    # Membership was looked up once per token and then cached
+    lookups = [r for r in transport.requests if r.method == 'GET']
+    assert len(lookups) == 2
+    # Updating the room itself is routed the same way
+    transport.add('PUT', API + 'rooms/' + ROOM,
+                  lambda request: {'sender': token(request)})
+    assert spark.session.put(API + 'rooms/' + ROOM,
+                             json={'title': 'x'}).json() == {'sender': 'B'}
+
+
+def test_read_during_write_not_cached():
+    transport = InMemoryTransport()
+    room = room_data('old', id=ROOM)
+    transport.add('GET', API + 'rooms', lambda request: {'items': [room]})
+    transport.add('GET', API + 'rooms/' + ROOM, lambda request: room)
+    spark = SparkPool(['A'], transport=transport, query_cache_ttl=60)
+
+    def titles():
+        return [item.title for item in SparkContainer(SparkRoom, parent=spark)]
+
+    def put(request):
+        # Another thread lists the old state while the write is in flight
+        reader = threading.Thread(target=titles)
+        reader.start()
+        reader.join()
+        room.update(request.json())
+        return room
+    transport.add('PUT', API + 'rooms/' + ROOM, put)
+    spark.session.put(API + 'rooms/' + ROOM, json={'title': 'new'})
+    assert titles() == ['new']
@@ -0,0 +1,129 @@
+import pytest
+from sparkpy.exceptions import SparkCircuitOpenError
+from sparkpy.retry import SparkRetryPolicy, SparkCircuitBreaker, endpoint
+from sparkpy.session import SparkSession
+from sparkpy.transport import FakeRequest, FakeResponse, InMemoryTransport
+
+DATE = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+
+def response(status_code, headers=None):
+    request = FakeRequest('GET', 'https://api.ciscospark.com/v1/rooms',
+                          {}, None, b'')
+    return FakeResponse(request, status_code, b'', headers)
+
+
+def test_endpoint():
+    assert endpoint('https://api.ciscospark.com/v1/rooms/abc') == 'rooms'
+    assert endpoint('https://api.ciscospark.com/v1/team/memberships') == \
+        'team/memberships'
+
+
+def test_policy():
+    policy = SparkRetryPolicy(backoff_base=1, backoff_max=4)
+    assert policy.retryable('POST', response(429))
+    assert policy.retryable('GET', response(503))
+    assert not policy.retryable('POST', response(503))
+    assert not policy.retryable('GET', response(404))
+    assert policy.retryable('GET', error=ConnectionError())
+    assert not policy.retryable('POST', error=ConnectionError())
+    assert policy.delay(1, response(429, {'Retry-After': '7'})) == 7
+    assert policy.delay(1, response(429, {'Retry-After': '1.5'})) == 1.5
+    # A date already past means no wait
+    assert policy.delay(1, response(429, {'Retry-After': DATE})) == 0
+    assert 0 <= policy.delay(1, response(429, {'Retry-After': 'soon'})) <= 2
+    assert all(0 <= policy.delay(10) <= 4 for _ in range(100))
+
+
+def test_retry_after_http_date(monkeypatch):
+    from sparkpy import retry
+    monkeypatch.setattr(retry.time, 'time', lambda: 1445412470.0)
+    policy = SparkRetryPolicy()
+    assert policy.delay(1, response(429, {'Retry-After': DATE})) == 10
+
+
+def test_rate_limit_backoff():
+    transport = InMemoryTransport()
+    transport.add('GET', 'https://api.ciscospark.com/v1/rooms',
+                  (429, {'message': 'slow down'}, {'Retry-After': '2.5'}))
+    transport.add('GET', 'https://api.ciscospark.com/v1/people',
+                  (429, {'message': 'slow down'}))
+    policy = SparkRetryPolicy(max_attempts=1, backoff_base=0.5, backoff_max=1)
+    session = SparkSession('TOKEN', transport=transport, retry=policy)
+    # Fractional Retry-After values are honoured
+    session.get('https://api.ciscospark.com/v1/rooms')
+    assert 2 < session.backoff.remaining <= 2.5
+    # Without one the wait comes from the retry policy
+    session = SparkSession('TOKEN', transport=transport, retry=policy)
+    session.get('https://api.ciscospark.com/v1/people')
+    assert session.backoff.remaining <= 1
+
+
+def test_breaker(monkeypatch):
+    from sparkpy import retry
+    clock = [0.0]
+    monkeypatch.setattr(retry, 'monotonic', lambda: clock[0])
+    breaker = SparkCircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.failure('rooms')
+    breaker.before('rooms')
+    breaker.failure('rooms')
+    assert breaker.state('rooms') == 'open'
+    with pytest.raises(SparkCircuitOpenError):
+        breaker.before('rooms')
+    # Other endpoints are unaffected
+    breaker.before('messages')
+    clock[0] = 11
+    assert breaker.state('rooms') == 'half-open'
+    breaker.before('rooms')
+    # Only one trial request at a time
+    with pytest.raises(SparkCircuitOpenError):
+        breaker.before('rooms')
+    breaker.success('rooms')
+    assert breaker.state('rooms') == 'closed'
+
+
+def flaky(failures, status=503):
+    calls = []
+
+    def route(handler):
+        calls.append(handler.command)
+        if len(calls) <= failures:
+            return status, {'message': 'unavailable'}, {}
+        return 200, {'items': []}, {}
+    return route, calls
+
+
+def test_session_retries_idempotent(fake_server):
+    route, calls = flaky(2)
+    fake_server.routes[('GET', '/v1/rooms')] = route
+    fake_server.routes[('POST', '/v1/rooms')] = route
+    session = SparkSession('TOKEN', retry=SparkRetryPolicy(backoff_base=0.01))
+    assert session.get(fake_server.url + '/v1/rooms').status_code == 200
+    assert len(calls) == 3
+    calls.clear()
+    assert session.post(fake_server.url + '/v1/rooms').status_code == 503
+    assert len(calls) == 1
+
+
+def test_session_attempt_budget(fake_server):
+    route, calls = flaky(10)
+    fake_server.routes[('GET', '/v1/rooms')] = route
+    policy = SparkRetryPolicy(max_attempts=3, backoff_base=0.01)
+    session = SparkSession('TOKEN', retry=policy, breaker=False)
+    assert session.get(fake_server.url + '/v1/rooms').status_code == 503
+    assert len(calls) == 3
+
+
+def test_session_circuit_breaker(fake_server):
+    route, calls = flaky(100)
+    fake_server.routes[('GET', '/v1/rooms')] = route
+    session = SparkSession('TOKEN',
+                           retry=SparkRetryPolicy(max_attempts=1),
+                           breaker=SparkCircuitBreaker(failure_threshold=3))
+    for _ in range(3):
+        session.get(fake_server.url + '/v1/rooms')
+    with pytest.raises(SparkCircuitOpenError):
+        session.get(fake_server.url + '/v1/rooms')
+    assert len(calls) == 3
+    # Other endpoints still go through
+    assert session.get(fake_server.url + '/v1/people').status_code == 200
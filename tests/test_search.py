@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime
+from sparkpy.models.room import SparkRoom
+from sparkpy.search import SparkSearchIndex
+from sparkpy.utils import uuid_to_api_id, uuid_v4_str
+from fakes import FakeSpark
+
+
+def message(i, room='ROOM_A', email='a@example.com', text='hello world'):
+    return {'id': f'MSG{i}',
+            'roomId': room,
+            'personId': 'PERSON_' + email[0].upper(),
+            'personEmail': email,
+            'created': f'2017-08-{i:02d}T12:00:00.000Z',
+            'text': text}
+
+
+def build_index():
+    index = SparkSearchIndex()
+    index.add([message(1, text='lunch on friday'),
+               message(2, email='b@example.com', text='dinner tonight'),
+               message(3, room='ROOM_B', text='lunch again'),
+               message(4, text='nothing to see')])
+    return index
+
+
+def test_search_text():
+    index = build_index()
+    assert len(index) == 4
+    assert {m['id'] for m in index.search('lunch')} == {'MSG1', 'MSG3'}
+    assert [m['id'] for m in index.search('lunch', room='ROOM_B')] == ['MSG3']
+
+
+def test_search_filters():
+    index = build_index()
+    assert [m['id'] for m in index.search(person='b@example.com')] == ['MSG2']
+    assert [m['id'] for m in index.search(person='PERSON_B')] == ['MSG2']
+    results = index.search(since='2017-08-02', until=datetime(2017, 8, 4))
+    assert [m['id'] for m in results] == ['MSG3', 'MSG2']
+
+
+def test_incremental_update():
+    index = build_index()
+    index.add([message(1, text='breakfast instead')])
+    assert len(index) == 4
+    assert [m['id'] for m in index.search('lunch')] == ['MSG3']
+    assert [m['id'] for m in index.search('breakfast')] == ['MSG1']
+    # Only a sync moves the watermark
+    assert index.latest('ROOM_A') is None
+
+
+def test_interrupted_sync():
+    room_id = uuid_to_api_id(uuid_v4_str(), 'rooms')
+    # Newest first, three per page
+    pages = [[message(i, room=room_id) for i in range(page, page - 3, -1)]
+             for page in (9, 6, 3)]
+    spark = FakeSpark()
+    served = spark.serve_pages('messages', pages, fail_on=1)
+    room = SparkRoom(room_id, parent=spark)
+    index = SparkSearchIndex()
+    with pytest.raises(ConnectionError):
+        index.sync_room(room, per_page=3)
+    assert len(index) == 3
+    assert index.latest(room_id) is None
+    # The next sync fetches the pages it missed
+    served['fail_on'] = None
+    assert index.sync_room(room, per_page=3) == 9
+    assert len(index) == 9
+    assert index.latest(room_id) == '2017-08-09T12:00:00.000Z'
+    # Then only messages newer than the watermark
+    served['pages'] = [[message(10, room=room_id)] + pages[0][:2]] + pages
+    assert index.sync_room(room, per_page=3) == 1
+    assert index.latest(room_id) == '2017-08-10T12:00:00.000Z'
+    assert len(spark.requests) == 6
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from sparkpy.session import SparkSession
+
+THREADS = 32
+REQUESTS = 20
+
+
+def test_shared_session_stress(fake_server):
+    state = {'count': 0, 'limited_at': None, 'arrivals': []}
+    lock = threading.Lock()
+
+    def rate_limited(handler):
+        # The 100th request is rate limited, everything else succeeds
+        with lock:
+            state['count'] += 1
+            state['arrivals'].append(monotonic())
+            if state['count'] == 100:
+                state['limited_at'] = monotonic()
+                return 429, {}, {'Retry-After': '1'}
+        return 200, {'items': [], 'auth': handler.headers['Authorization']}, {}
+
+    fake_server.routes[('GET', '/rooms')] = rate_limited
+    session = SparkSession('TOKEN', pool_maxsize=THREADS, thread_safe=True,
+                           coalesce=False)
+    url = fake_server.url + '/rooms'
+
+    def worker(i):
+        results = []
+        for _ in range(REQUESTS):
+            resp = session.get(url)
+            results.append((resp.status_code, resp.json()['auth']))
+        return results
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = [r for batch in pool.map(worker, range(THREADS))
+                   for r in batch]
+
+    assert len(results) == THREADS * REQUESTS
+    assert all(status == 200 for status, _ in results)
+    assert all(auth == 'Bearer TOKEN' for _, auth in results)
+    # The rate limited request was retried
+    assert state['count'] == THREADS * REQUESTS + 1
+    # Each thread used its own session, all sharing one pool
+    stats = session.pool_stats()
+    assert list(stats.values())[0]['connections'] <= THREADS
+    # Other threads held their requests for the Retry-After period,
+    # allowing a little slack for requests already in flight
+    start = state['limited_at']
+    assert not [t for t in state['arrivals'] if start + 0.2 < t < start + 0.9]
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import sparkpy
+from datetime import datetime
+from sparkpy.models.time import SparkTime, to_epoch_ns
+
+TS = '2017-08-26T12:01:36.373Z'
+
+
+def test_lazy_parse():
+    ts = SparkTime(TS)
+    assert ts._dt is None
+    assert ts.dt == datetime(2017, 8, 26, 12, 1, 36, 373000)
+    assert ts.dt is ts.dt
+    assert repr(ts) == TS
+
+
+def test_now():
+    now = SparkTime()
+    assert len(now.ts) == 24
+    assert now.ts.endswith('Z')
+    assert SparkTime(now.ts) == now.dt.replace(
+        microsecond=now.dt.microsecond // 1000 * 1000)
+
+
+def test_compare():
+    early = SparkTime('2017-08-26T12:01:36.373Z')
+    late = SparkTime('2017-08-26T12:01:36.374Z')
+    assert early < late
+    assert late >= early
+    assert early != late
+    assert early == SparkTime(TS)
+    # String comparisons never needed to parse
+    assert early._dt is None and late._dt is None
+    assert early < datetime(2018, 1, 1)
+    assert sorted([late, early]) == [early, late]
+
+
+def test_hash():
+    same = [SparkTime(TS),
+            SparkTime('2017-08-26T12:01:36.373+00:00'),
+            SparkTime('2017-08-26T12:01:36.373000Z')]
+    assert all(ts == same[0] for ts in same)
+    assert len(set(same)) == 1
+    assert {same[0]: 'x'}[same[1]] == 'x'
+    assert hash(same[0]) == hash(same[0].dt)
+
+
+def test_to_epoch_ns():
+    stamps = [TS, SparkTime('1970-01-01T00:00:01.000Z'), datetime(1970, 1, 1)]
+    ns = list(to_epoch_ns(stamps))
+    assert ns[1] == 1000000000
+    assert ns[2] == 0
+    assert ns[0] == SparkTime(TS).epoch_ns == 1503748896373000000
+
+
+def test_numpy_imported_on_use():
+    code = 'import sys, sparkpy.models.time; print("numpy" in sys.modules)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(sparkpy.__file__)))
+    result = subprocess.run([sys.executable, '-c', code],
+                            env=dict(os.environ, PYTHONPATH=root),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,92 @@
+import pytest
+from sparkpy.models.container import SparkContainer
+from sparkpy.models.file import SparkFile
+from sparkpy.models.room import SparkRoom
+from sparkpy.retry import SparkRetryPolicy
+from sparkpy.session import SparkSession
+from sparkpy.transport import InMemoryTransport, HttpxTransport, parse_links
+from fakes import FakeSpark, room_data
+
+ROOMS = 'https://api.ciscospark.com/v1/rooms'
+
+
+def test_in_memory_session():
+    transport = InMemoryTransport()
+    transport.add('POST', ROOMS, lambda request: (200, request.json()))
+    session = SparkSession('TOKEN', transport=transport)
+    response = session.post(ROOMS, json={'title': 'A room'})
+    assert response.json() == {'title': 'A room'}
+    request = transport.requests[0]
+    assert request.headers['authorization'] == 'Bearer TOKEN'
+    # Per request headers replace the session's regardless of case
+    session.get(ROOMS, headers={'content-type': 'text/plain'})
+    assert transport.requests[1].headers['Content-Type'] == 'text/plain'
+    assert session.get(ROOMS + '/missing').status_code == 404
+
+
+def test_transport_options():
+    transport = InMemoryTransport()
+    transport.add('GET', ROOMS, {'items': []})
+    session = SparkSession('TOKEN', transport=transport,
+                           response_cache_ttl=60)
+    session.get(ROOMS, allow_redirects=False, verify=False)
+    assert transport.requests[0].options == {'allow_redirects': False,
+                                             'verify': False}
+    # Requests with options aren't cached
+    session.request('GET', ROOMS, cookies={'a': 'b'})
+    session.request('GET', ROOMS, cookies={'a': 'b'})
+    assert len(transport.requests) == 3
+    assert transport.requests[2].options == {'cookies': {'a': 'b'}}
+
+
+def test_in_memory_retry():
+    transport = InMemoryTransport()
+    responses = [(503, {}), (503, {}), (200, {'items': []})]
+    transport.add('GET', ROOMS, lambda request: responses.pop(0))
+    session = SparkSession('TOKEN', transport=transport,
+                           retry=SparkRetryPolicy(backoff_base=0.01))
+    assert session.get(ROOMS).status_code == 200
+    assert len(transport.requests) == 3
+
+
+def test_container_pagination():
+    transport = InMemoryTransport()
+
+    def rooms(request):
+        page = int(request.params.get('page', 0))
+        headers = {}
+        if page < 2:
+            headers['Link'] = f'<{ROOMS}?page={page + 1}>; rel="next"'
+        items = [room_data() for i in range(2)]
+        return 200, {'items': items}, headers
+
+    transport.add('GET', ROOMS, rooms)
+    spark = FakeSpark(transport)
+    container = SparkContainer(SparkRoom, parent=spark, per_page=2)
+    while not container.loaded:
+        container.more()
+    assert len(container) == 6
+    assert len(transport.requests) == 3
+
+
+def test_file_download(tmp_path):
+    url = 'https://api.ciscospark.com/v1/contents/FILE'
+    transport = InMemoryTransport()
+    headers = {'Content-Disposition': 'attachment; filename="notes.txt"'}
+    transport.add('HEAD', url, (200, b'', headers))
+    transport.add('GET', url, (200, b'x' * 5000, headers))
+    spark = FakeSpark(transport)
+    SparkFile(url, parent=spark).download(str(tmp_path) + '/')
+    assert (tmp_path / 'notes.txt').read_bytes() == b'x' * 5000
+
+
+def test_parse_links():
+    links = parse_links('<https://a/1>; rel="next", <https://a/0>; rel=prev')
+    assert links['next']['url'] == 'https://a/1'
+    assert links['prev']['url'] == 'https://a/0'
+
+
+def test_httpx_transport(fake_server):
+    pytest.importorskip('httpx')
+    session = SparkSession('TOKEN', transport=HttpxTransport(http2=False))
+    assert session.get(fake_server.url + '/v1/rooms').json() == {'items': []}
@@ -69,3 +69,13 @@ def test_uuid_to_api_id():
         uuid_to_api_id('INCORRECT', 'VALUES')
 
 
+def test_spark_headers():
+    headers = SparkHeaders({'Content-type': 'application/json'})
+    assert headers['content-type'] == 'application/json'
+    headers['Content-Type'] = 'text/plain'
+    assert len(headers) == 1
+    assert dict(headers) == {'Content-Type': 'text/plain'}
+    copy = headers.copy()
+    del copy['CONTENT-TYPE']
+    assert 'content-type' not in copy
+    assert 'content-type' in headers